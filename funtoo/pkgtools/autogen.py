@@ -11,9 +11,9 @@ from typing import Tuple, List
 
 import dyne.org.funtoo.metatools.pkgtools as pkgtools
 from subpop.util import load_plugin
-from yaml import safe_load
 
 import metatools.cmd
+from metatools.yaml_util import safe_load
 
 """
 The `PENDING_QUE` will be built up to contain a full list of all the catpkgs we want to autogen in the full run
@@ -260,12 +260,13 @@ async def execute_generator(
 		autogen_id=None
 ):
 	"""
-	This function will return an async function that requires no arguments, that is ready to run in its own
-	thread using run_async_adapter. This function will execute the full auto-generation for a particular
-	generator/autogen.py and will wait until all of its asyncio tasks have completed before returning. This
-	neatly allows an autogeneration for a sub/generator/autogen.py to be contained in its own thread, improving
-	performance and allowing the use of thread-local storage to keep track of things specific to this autogen
-	run.
+	This function will return an async function, along with the ``pkginfo_list`` to call it with. The async function
+	will execute the full auto-generation for a particular generator/autogen.py and will wait until all of its asyncio
+	tasks have completed before returning.
+
+	All generators are run concurrently as tasks on the caller's event loop (see
+	``execute_all_queued_generators()``), rather than each getting a thread and event loop of its own, so there is no
+	per-generator event loop setup cost.
 	"""
 	if not generator_sub_path:
 		raise TypeError("generator_sub_path not set to a path.")
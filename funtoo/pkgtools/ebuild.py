@@ -2,15 +2,18 @@
 
 from __future__ import annotations
 import asyncio
+import functools
+import glob
+import importlib.util
+import itertools
 import logging
 import os
 import shutil
+import subprocess
 import threading
 from asyncio import Task
-from collections import OrderedDict, defaultdict
 from collections.abc import Mapping
 from datetime import datetime
-from subprocess import getstatusoutput
 from typing import Optional, Tuple
 
 import jinja2
@@ -23,7 +26,97 @@ log = logging.getLogger('metatools.autogen')
 
 import dyne.org.funtoo.metatools.pkgtools as pkgtools
 
-#
+# This Jinja environment is used to load templates that have been compiled ahead-of-time by
+# ``bin/precompile-templates``. It uses the same default settings as ``jinja2.Template()`` so that
+# precompiled templates render identically to templates parsed at runtime.
+
+PRECOMPILED_TEMPLATE_ENV = jinja2.Environment()
+
+
+def load_precompiled_template(template_file):
+	"""
+	Look for a ``<template_file>.py`` module generated by ``bin/precompile-templates``. If it exists and is at
+	least as new as the template itself, load it and return a ready-to-render ``jinja2.Template`` -- this
+	skips Jinja parsing and compilation entirely. Otherwise, None is returned and the caller should parse
+	the template from source.
+	"""
+	compiled_file = template_file + ".py"
+	try:
+		if os.stat(compiled_file).st_mtime < os.stat(template_file).st_mtime:
+			# stale -- template has been modified since it was precompiled.
+			return None
+	except FileNotFoundError:
+		return None
+	spec = importlib.util.spec_from_file_location(f"_precompiled_tmpl_{abs(hash(compiled_file))}", compiled_file)
+	module = importlib.util.module_from_spec(spec)
+	try:
+		spec.loader.exec_module(module)
+	except Exception as e:
+		log.warning("Unable to load precompiled template %s, parsing %s instead: %r", compiled_file, template_file, e)
+		return None
+	return jinja2.Template.from_module_dict(
+		PRECOMPILED_TEMPLATE_ENV, module.__dict__, PRECOMPILED_TEMPLATE_ENV.make_globals(None)
+	)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_env():
+	"""
+	Return the Jinja Environment shared by all BreezyBuilds. Templates are loaded by absolute path, and their
+	compiled bytecode is persisted in ``pkgtools.model.jinja_cache_path`` so that subsequent runs don't need to
+	compile unchanged templates again. Compiled templates are cached by ``load_template_file()`` (which also
+	handles staleness), so the Environment's own template cache is disabled.
+	"""
+	os.makedirs(pkgtools.model.jinja_cache_path, exist_ok=True)
+	return jinja2.Environment(
+		loader=jinja2.FileSystemLoader("/"),
+		bytecode_cache=jinja2.FileSystemBytecodeCache(pkgtools.model.jinja_cache_path),
+		cache_size=0
+	)
+
+
+@functools.lru_cache(maxsize=512)
+def compile_template(template_text):
+	"""
+	Parse and compile Jinja template source. Compiled templates are cached, so BreezyBuilds that share the same
+	``template_text`` only pay for Jinja parsing once. Returned templates are shared, so they must not be modified.
+	"""
+	return get_template_env().from_string(template_text)
+
+
+@functools.lru_cache(maxsize=512)
+def load_template_file(template_file, mtime_ns):
+	"""
+	Return a compiled ``jinja2.Template`` for ``template_file``, using a precompiled template if one is available.
+	Results are cached by path and modification time (``mtime_ns``), so autogens that generate many ebuilds from
+	the same template will only read and compile it once, while still picking up any changes to the file.
+	"""
+	template = load_precompiled_template(template_file)
+	if template is not None:
+		return template
+	env = get_template_env()
+	try:
+		return env.get_template(os.path.abspath(template_file))
+	except jinja2.exceptions.TemplateNotFound:
+		raise FileNotFoundError(template_file)
+	except jinja2.exceptions.TemplateError as te:
+		raise BreezyError(f"Template error in {template_file}: {repr(te)}")
+	except Exception as te:
+		raise BreezyError(f"Unknown error processing {template_file}: {repr(te)}")
+
+
+# Directories we have already created in this process. Many BreezyBuilds (one per version) share the same package
+# directory, so this allows us to avoid calling os.makedirs() -- which stat()s every path component -- each time:
+
+CREATED_DIRS = set()
+
+
+def makedirs_once(path):
+	if path in CREATED_DIRS:
+		return
+	os.makedirs(path, exist_ok=True)
+	CREATED_DIRS.add(path)
+
 
 class BreezyError(Exception):
 	def __init__(self, msg):
@@ -64,10 +157,7 @@ class Archive:
 
 	@property
 	def catpkgs(self):
-		outstr = ""
-		for bzb in self.breezybuilds:
-			outstr = f"{outstr} {bzb.catpkg}"
-		return outstr.strip()
+		return " ".join(bzb.catpkg for bzb in self.breezybuilds)
 
 	@property
 	def extract_path(self):
@@ -159,7 +249,7 @@ class Archive:
 				cmd = f"tar -C {self.extract_path} -c --zstd -f {temp_archive} ."
 			else:
 				raise ValueError(f"Unrecognized archive format: {self.final_name}. Supported formats: tar.gz, tar.xz, tar.zst")
-			log.debug(f"store: command: {cmd}")
+			log.debug("store: command: %s", cmd)
 
 			proc, out = await capture_bg(cmd)
 			if proc.returncode != 0:
@@ -183,7 +273,7 @@ class Archive:
 					os.unlink(dist_path)
 				shutil.copy(self.blos_object.blob.path, dist_path)
 			except PermissionError:
-				log.warning(f"Unable to copy dynamic archive to {dist_path}. Make sure you are in the portage group.")
+				log.warning("Unable to copy dynamic archive to %s. Make sure you are in the portage group.", dist_path)
 
 	async def store_by_name(self, key: dict = None, metadata: dict = None, existing=None):
 		"""
@@ -220,7 +310,7 @@ class Archive:
 		if final_name:
 			key["final_name"] = final_name
 		blos_object, metadata = pkgtools.model.fastpull_session.get_file_dynamic(key)
-		log.debug(f"In find, blos object found: {blos_object} using key {key}")
+		log.debug("In find, blos object found: %s using key %s", blos_object, key)
 		if blos_object is None:
 			return None, None
 		else:
@@ -248,16 +338,44 @@ class Archive:
 		ep = self.extract_path
 		os.makedirs(ep, exist_ok=True)
 		if self.final_name.endswith(".zip"):
-			cmd = f"unzip -o {self.final_path} -d {ep}"
+			cmd = ["unzip", "-o", self.final_path, "-d", ep]
 		else:
-			cmd = f"tar -C {ep} -xf {self.final_path}"
-		s, o = getstatusoutput(cmd)
-		if s != 0:
-			raise pkgtools.ebuild.BreezyError("Command failure: %s" % cmd)
+			cmd = ["tar", "-C", ep, "-xf", self.final_path]
+		# Run the extractor directly rather than through a shell, so we only fork once per archive:
+		result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		if result.returncode != 0:
+			raise pkgtools.ebuild.BreezyError("Command failure: %s" % " ".join(cmd))
 
 	def cleanup(self):
-		# TODO: check for path stuff like ../.. in final_name to avoid security issues.
-		getstatusoutput("rm -rf " + os.path.join(pkgtools.model.temp_path, "artifact_extract", self.final_name))
+		extract_root = os.path.realpath(os.path.join(pkgtools.model.temp_path, "artifact_extract"))
+		ep = os.path.realpath(os.path.join(extract_root, self.final_name))
+		# Make sure things like ../.. in final_name can't cause us to remove anything outside of extract_root:
+		if ep == extract_root or os.path.commonpath([extract_root, ep]) != extract_root:
+			raise pkgtools.ebuild.BreezyError(f"Refusing to clean up {ep}, which is not inside {extract_root}.")
+		shutil.rmtree(ep, ignore_errors=True)
+
+	def find_extracted(self, pattern="*"):
+		"""
+		Return the path of the first entry in our extract path matching the glob ``pattern``, such as the top-level
+		source directory of an extracted tarball. Globbing stops at the first match rather than listing every match.
+		"""
+		match = next(glob.iglob(os.path.join(self.extract_path, pattern)), None)
+		if match is None:
+			raise IndexError(f"Nothing matching {pattern} found in {self.extract_path}.")
+		return match
+
+	async def extract_async(self):
+		"""
+		Like ``extract()``, but runs in a worker thread, so that extracting a large source tree doesn't block the event
+		loop (and all our other in-flight fetches) meanwhile.
+		"""
+		await asyncio.get_running_loop().run_in_executor(None, self.extract)
+
+	async def cleanup_async(self):
+		"""
+		Like ``cleanup()``, but runs in a worker thread -- see ``extract_async()``.
+		"""
+		await asyncio.get_running_loop().run_in_executor(None, self.cleanup)
 
 	@property
 	def hashes(self):
@@ -311,9 +429,7 @@ class Artifact(Archive):
 		super().__init__(self.final_name)
 
 		assert self._url is not None
-		try:
-			assert self._url.split(':')[0] in ['http', 'https', 'ftp']
-		except (IndexError, AssertionError):
+		if not self._url.startswith(("http:", "https:", "ftp:")):
 			raise ValueError(f"url= argument of Artifact is '{self._url}', which appears malformed or an unsupported protocol.")
 		self.key = key
 		self.extra_http_headers = extra_http_headers
@@ -363,7 +479,7 @@ class Artifact(Archive):
 				password=None,
 				final_name=self.final_name
 			)
-			log.debug(f'Artifact.ensure_fetched:{threading.get_ident()} now fetching {self.url} using FetchRequest {req}')
+			log.debug('Artifact.ensure_fetched:%s now fetching %s using FetchRequest %s', threading.get_ident(), self.url, req)
 			# TODO: this used to be indexed by catpkg, and by final_name. So we are now indexing by source URL.
 			# TODO: what exceptions are we interested in here?
 			self.blos_object = await pkgtools.model.fastpull_session.get_file_by_url(req)
@@ -374,7 +490,7 @@ class Artifact(Archive):
 			# We encountered some error retrieving the resource.
 			if throw:
 				raise fe
-			log.error(f"Fetch error: {fe}")
+			log.error("Fetch error: %r", fe)
 			return False
 		return True
 
@@ -389,13 +505,11 @@ class Artifact(Archive):
 
 
 def aggregate(meta_list):
-	out_list = []
-	for item in meta_list:
-		if isinstance(item, list):
-			out_list += item
-		else:
-			out_list.append(item)
-	return out_list
+	"""
+	Flatten ``meta_list`` by one level -- any items that are lists are expanded in place -- and return the result
+	as a new list.
+	"""
+	return list(itertools.chain.from_iterable(item if isinstance(item, list) else (item,) for item in meta_list))
 
 
 class BreezyBuild:
@@ -483,19 +597,13 @@ class BreezyBuild:
 				self._revision = int(self._revision)
 			else:
 				raise TypeError(f"Unrecognized type for revision= argument for {self.catpkg}: {repr(type(self._revision))}")
-			pkgtools.model.log.debug(f"Fixup-revision: {self.catpkg}: {type(self._revision)} {self._revision}")
+			pkgtools.model.log.debug("Fixup-revision: %s: %s %s", self.catpkg, type(self._revision), self._revision)
 
 	def iter_artifacts(self):
-		if type(self.artifacts) == list:
-			for artifact in self.artifacts:
-				yield artifact
-		elif type(self.artifacts) in (dict, OrderedDict, defaultdict):
-			for key, artifact in self.artifacts.items():
-				if isinstance(artifact, list):
-					for lil_art in artifact:
-						yield lil_art
-				else:
-					yield artifact
+		if isinstance(self.artifacts, list):
+			return iter(self.artifacts)
+		elif isinstance(self.artifacts, Mapping):
+			return iter(aggregate(self.artifacts.values()))
 		else:
 			raise TypeError("Invalid type for artifacts passed to BreezyBuild -- should be list or dict.")
 
@@ -548,6 +656,8 @@ class BreezyBuild:
 		"""
 
 		fetch_tasks_dict = {}
+		# Bound the number of concurrent fetches so that BreezyBuilds with many Artifacts do not flood the Spider:
+		fetch_slots = asyncio.Semaphore(pkgtools.model.max_fetch_concurrency)
 
 		for artifact in self.iter_artifacts():
 			if isinstance(artifact, Mapping):
@@ -562,7 +672,8 @@ class BreezyBuild:
 			if artifact.__class__.__name__ == "Artifact":
 				async def lil_coroutine(a):
 					try:
-						status = await a.ensure_completed()
+						async with fetch_slots:
+							status = await a.ensure_completed()
 						return a, status
 					except FetchError as fe:
 						pkgtools.model.log.error(fe, exc_info=False)
@@ -574,15 +685,14 @@ class BreezyBuild:
 
 		# Wait for any artifacts that are still fetching:
 		results, failures = await pkgtools.autogen.gather_pending_tasks("fetch", fetch_tasks_dict.values())
-		completion_list = aggregate(results)
 		if failures:
 			for fail_task in failures:
 				logging.exception("Fetch exception", exc_info=fail_task.exception())
 			raise BreezyError("Fetch exceptions encountered.")
 		fetch_fail = False
-		for artifact, status in completion_list:
+		for artifact, status in results:
 			if status is False:
-				log.error(f"Artifact for url {artifact.url} referenced in {artifact.catpkgs} could not be fetched.")
+				log.error("Artifact for url %s referenced in %s could not be fetched.", artifact.url, artifact.catpkgs)
 				fetch_fail = True
 		if fetch_fail:
 			raise BreezyError("Unable to fetch at least one artifact.")
@@ -610,9 +720,11 @@ class BreezyBuild:
 
 		# This will cause the BreezyBuild to start autogeneration immediately, appending the task to the thread-
 		# local context so we can grab the result later. The return value will be the BreezyBuild object itself,
-		# thanks to the wrapper.
+		# thanks to the wrapper. task.info is used for error messages if the task fails.
+		#
+		# Note that we intentionally don't use a TaskGroup here -- it would cancel every other BreezyBuild as soon
+		# as one fails, whereas we want to generate everything we can and report all failures at the end.
 		bzb_task = Task(wrapper(self))
-		bzb_task.bzb = self
 		bzb_task.info = self.catpkg_version_rev
 		hub.THREAD_CTX.running_breezybuilds.append(bzb_task)
 
@@ -620,14 +732,14 @@ class BreezyBuild:
 	def pkgdir(self):
 		if self._pkgdir is None:
 			self._pkgdir = os.path.join(self.source_tree, self.cat, self.name)
-			os.makedirs(self._pkgdir, exist_ok=True)
+			makedirs_once(self._pkgdir)
 		return self._pkgdir
 
 	@property
 	def output_pkgdir(self):
 		if self._pkgdir is None:
 			self._pkgdir = os.path.join(self.output_tree, self.cat, self.name)
-			os.makedirs(self._pkgdir, exist_ok=True)
+			makedirs_once(self._pkgdir)
 		return self._pkgdir
 
 	@property
@@ -675,41 +787,48 @@ class BreezyBuild:
 			return
 
 		key = self.output_pkgdir + "/Manifest"
-
-		for artifact in self.iter_artifacts():
-			success = await artifact.ensure_completed()
+		# Several BreezyBuilds (i.e. multiple versions of a package) can share the same Manifest and Artifacts, so
+		# this is a set, which takes care of removing duplicate lines:
+		manifest_lines = pkgtools.model.manifest_lines[key]
+
+		# Artifacts are independent of one another, so make sure they are all complete concurrently rather than one
+		# at a time:
+		artifacts = list(self.iter_artifacts())
+		statuses = await asyncio.gather(*[artifact.ensure_completed() for artifact in artifacts])
+		for artifact, success in zip(artifacts, statuses):
 			if not success:
 				raise BreezyError(f"Something prevented us from storing Manifest data for {key}.")
-			pkgtools.model.manifest_lines[key].add(
-				"DIST %s %s BLAKE2B %s SHA512 %s\n"
-				% (artifact.final_name, artifact.size, artifact.hash("blake2b"), artifact.hash("sha512"))
-			)
+			hashes = artifact.hashes
+			manifest_lines.add(f"DIST {artifact.final_name} {hashes['size']} BLAKE2B {hashes['blake2b']} SHA512 {hashes['sha512']}\n")
 
 	def create_ebuild(self):
 		if not self.template_text:
 			template_file = os.path.join(self.template_path, self.template)
 			try:
-				with open(template_file, "r") as tempf:
-					try:
-						template = jinja2.Template(tempf.read())
-					except jinja2.exceptions.TemplateError as te:
-						raise BreezyError(f"Template error in {template_file}: {repr(te)}")
-					except Exception as te:
-						raise BreezyError(f"Unknown error processing {template_file}: {repr(te)}")
+				template = load_template_file(template_file, os.stat(template_file).st_mtime_ns)
 			except FileNotFoundError as e:
-				log.error(f"Could not find template: {template_file}")
+				log.error("Could not find template: %s", template_file)
 				raise BreezyError(f"Template file not found: {template_file}")
 		else:
-			template = jinja2.Template(self.template_text)
-		# allow "src_uri" to be used inside all templates to print out official src_uri of all artifacts.
-		template.globals.update({"src_uri": self.src_uri_with_use})
-		template.globals.update({"src_uri_with_use": self.src_uri_with_use})
-		with open(self.output_ebuild_path, "wb") as myf:
-			try:
-				myf.write(template.render(**self.template_args).encode("utf-8"))
-			except Exception as te:
-				raise BreezyError(f"Error rendering template: {repr(te)}")
-		log.info("Created: " + os.path.relpath(self.output_ebuild_path))
+			template = compile_template(self.template_text)
+		# allow "src_uri" to be used inside all templates to print out official src_uri of all artifacts. Compiled
+		# templates are shared between BreezyBuilds (and threads), so these are passed at render time rather than
+		# being set in the template's globals.
+		render_args = {"src_uri": self.src_uri_with_use, "src_uri_with_use": self.src_uri_with_use}
+		render_args.update(self.template_args)
+		try:
+			ebuild_data = template.render(**render_args).encode("utf-8")
+		except Exception as te:
+			raise BreezyError(f"Error rendering template: {repr(te)}")
+		# We write the whole ebuild with a single unbuffered write(), since it is already completely in memory:
+		fd = os.open(self.output_ebuild_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+		try:
+			view = memoryview(ebuild_data)
+			while view:
+				view = view[os.write(fd, view):]
+		finally:
+			os.close(fd)
+		log.info("Created: %s", os.path.relpath(self.output_ebuild_path))
 
 	async def generate(self):
 		"""
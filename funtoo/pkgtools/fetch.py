@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 import asyncio
+import json
 import re
+from collections import OrderedDict
+from copy import deepcopy
 from datetime import timedelta, datetime
 
 from metatools.fastpull.spider import FetchError, FetchRequest, ContentNotModified
 from metatools.fetch_cache import CacheMiss
 
+try:
+	# orjson serializes and decodes page bodies much faster than the json module:
+	import orjson
+except ImportError:
+	orjson = None
+
 """
 This sub implements high-level fetching pkgtools.model.log.c. Not the lower-level HTTP stuff. Things involving
 retrying, using our fetch cache, etc.
@@ -13,6 +22,77 @@ retrying, using our fetch cache, etc.
 
 import dyne.org.funtoo.metatools.pkgtools as pkgtools
 
+# In-process record of results we have fetched or read from the fetch cache during this run, indexed by the fetch cache
+# key. This allows us to skip the fetch cache entirely when we already know that a result is within its refresh
+# interval -- which is common for autogens that hit the same URL many times. It is a bounded LRU of encoded bodies
+# (see encode_body()), so it doesn't grow for the whole run, and each hit decodes a fresh copy for the caller:
+
+FRESH_RESULTS = OrderedDict()
+FRESH_RESULTS_MAX = 256
+
+
+def encode_body(body):
+	"""
+	Encode a fetched ``body`` so that independent copies can be handed out later with ``decode_body()``. Strings and
+	bytes are immutable and are kept as-is; JSON data is serialized. Anything else falls back to a deep copy.
+	"""
+	if isinstance(body, (str, bytes)):
+		return "immutable", body
+	try:
+		return "json", orjson.dumps(body) if orjson else json.dumps(body)
+	except (TypeError, ValueError):
+		return "copy", deepcopy(body)
+
+
+def decode_body(encoded):
+	"""
+	Return a new copy of a body encoded by ``encode_body()``, which the caller is free to modify.
+	"""
+	kind, data = encoded
+	if kind == "immutable":
+		return data
+	elif kind == "json":
+		return orjson.loads(data) if orjson else json.loads(data)
+	return deepcopy(data)
+
+
+def get_fresh_result(key_dict, refresh_interval):
+	"""
+	Return a copy of the body of an in-process result for ``key_dict`` that is within ``refresh_interval``, or None.
+	"""
+	if refresh_interval is None:
+		return None
+	key = tuple(sorted(key_dict.items()))
+	fresh = FRESH_RESULTS.get(key)
+	if fresh is None:
+		return None
+	fetched_on, encoded = fresh
+	if datetime.utcnow() - fetched_on > refresh_interval:
+		return None
+	FRESH_RESULTS.move_to_end(key)
+	# Callers are free to modify what we return (as they could with a fresh read from the fetch cache):
+	return decode_body(encoded)
+
+
+def record_fresh_result(key_dict, fetched_on, body, encoded=None):
+	key = tuple(sorted(key_dict.items()))
+	if encoded is None:
+		encoded = encode_body(body)
+	if encoded[0] == "copy":
+		# Not worth keeping a deep copy of something we can't serialize around for the rest of the run:
+		FRESH_RESULTS.pop(key, None)
+		return
+	FRESH_RESULTS[key] = (fetched_on, encoded)
+	FRESH_RESULTS.move_to_end(key)
+	while len(FRESH_RESULTS) > FRESH_RESULTS_MAX:
+		FRESH_RESULTS.popitem(last=False)
+
+
+# Live get_page() fetches that are currently in progress, indexed like FRESH_RESULTS. When several autogens ask for the
+# same page at the same time, only the first one fetches it and the others wait for its result:
+
+PENDING_PAGES = {}
+
 
 async def fetch_harness(fetch_method, url, refresh_interval=None, **kwargs):
 	"""
@@ -30,7 +110,7 @@ async def fetch_harness(fetch_method, url, refresh_interval=None, **kwargs):
 
 	This function will 'fall back' to the cache if the live fetch fails (and is thus more resilient).
 	"""
-	pkgtools.model.log.debug(f"refresh interval in fetch_harness: {refresh_interval}")
+	pkgtools.model.log.debug("refresh interval in fetch_harness: %s", refresh_interval)
 	attempts = 0
 	fail_reason = None
 	if refresh_interval is None:
@@ -49,43 +129,47 @@ async def fetch_harness(fetch_method, url, refresh_interval=None, **kwargs):
 		"url": url
 	})
 
+	body = get_fresh_result(key_dict, refresh_interval)
+	if body is not None:
+		pkgtools.model.log.info('Fetched %s (cached in memory, refresh_interval: %s)', url, refresh_interval)
+		return body
+
 	while attempts < pkgtools.model.fetch_attempts:
 		attempts += 1
 		try:
-			if fetch_method == "get_page" or refresh_interval is not None:
-				# Let's see if we should use an 'older' resource that we don't want to refresh as often.
-
-				# This call will return our cached resource if it's available and refresh_interval hasn't yet expired, i.e.
-				# it is not yet 'stale'.
-				try:
-					result = await pkgtools.model.fetch_cache.read(
-						key_dict=key_dict,
-						refresh_interval=refresh_interval
-					)
-					if refresh_interval:
-						pkgtools.model.log.info(f'Fetched {url} (cached, refresh_interval: {refresh_interval})')
-					else:
-						pkgtools.model.log.info(f'Fetched {url} (cached)')
-					return result["body"]
-				except CacheMiss:
-					# We'll continue and attempt a live fetch of the resource...
-					pass
+			# Let's see if we should use an 'older' resource that we don't want to refresh as often. (refresh_interval
+			# always has a value by this point, as we default it above.)
+
+			# This call will return our cached resource if it's available and refresh_interval hasn't yet expired, i.e.
+			# it is not yet 'stale'.
+			try:
+				result = await pkgtools.model.fetch_cache.read(
+					key_dict=key_dict,
+					refresh_interval=refresh_interval
+				)
+				record_fresh_result(key_dict, result["fetched_on"], result["body"])
+				pkgtools.model.log.info('Fetched %s (cached, refresh_interval: %s)', url, refresh_interval)
+				return result["body"]
+			except CacheMiss:
+				# We'll continue and attempt a live fetch of the resource...
+				pass
 			result = await fetch_method(url, **kwargs)
+			record_fresh_result(key_dict, datetime.utcnow(), result)
 			await pkgtools.model.fetch_cache.write(key_dict=key_dict, body=result)
 			return result
 		except FetchError as e:
 			if e.retry and attempts + 1 < pkgtools.model.fetch_attempts:
-				pkgtools.model.log.error(f"Fetch method {fetch_method.__name__}: {e.msg}; retrying...")
+				pkgtools.model.log.error("Fetch method %s: %s; retrying...", fetch_method.__name__, e.msg)
 				continue
 			# TODO: I need a lot more info here -- if something failed -- why? this is important for IPv6 debug
 			# if we got here, we are on our LAST retry attempt or retry is False:
-			pkgtools.model.log.warning(f"Unable to retrieve {url}... trying to used cached version instead...")
+			pkgtools.model.log.warning("Unable to retrieve %s... trying to used cached version instead...", url)
 			# TODO: these should be logged persistently so they can be investigated.
 			try:
 				# TODO: add kwargs here....
 				got = await pkgtools.model.fetch_cache.read(key_dict=key_dict)
 				return got["body"]
-			except CacheMiss as ce:
+			except CacheMiss:
 				# raise original exception
 				raise e
 		except asyncio.CancelledError as e:
@@ -108,10 +192,9 @@ def set_basic_auth(request: FetchRequest):
 	Keyword arguments to get_page() GET requests for authentication to certain URLs based on configuration
 	in ~/.autogen (YAML format.)
 	"""
-	if "authentication" in pkgtools.model.config:
-		if request.hostname in pkgtools.model.config["authentication"]:
-			auth_info = pkgtools.model.config["authentication"][request.hostname]
-			request.set_auth(**auth_info)
+	auth_info = pkgtools.model.config.get("authentication", {}).get(request.hostname)
+	if auth_info:
+		request.set_auth(**auth_info)
 
 
 async def really_get_page(url, encoding=None, is_json=False, cached_result=None):
@@ -170,10 +253,10 @@ async def really_get_page(url, encoding=None, is_json=False, cached_result=None)
 
 		except FetchError as e:
 			if e.retry and attempts + 1 < pkgtools.model.fetch_attempts:
-				pkgtools.model.log.error(f"Fetch method get_page: {e.msg}; retrying...")
+				pkgtools.model.log.error("Fetch method get_page: %s; retrying...", e.msg)
 				continue
 			# if we got here, we are on our LAST retry attempt or retry is False:
-			pkgtools.model.log.warning(f"Unable to retrieve {url}... trying to used cached version instead...")
+			pkgtools.model.log.warning("Unable to retrieve %s... trying to used cached version instead...", url)
 			# TODO: these should be logged persistently so they can be investigated.
 			if cached_result:
 				return cached_result["body"]
@@ -192,7 +275,7 @@ async def get_page(fetchable, encoding=None, refresh_interval=None, is_json=Fals
 	If we don't have a cached version locally, we will do a REAL HTTP fetch using ``really_get_page()``, above.
 	"""
 	pkgtools.model.log.debug(
-		f'get_page {fetchable}, refresh_interval={refresh_interval}, is_json={is_json}')
+		'get_page %s, refresh_interval=%s, is_json=%s', fetchable, refresh_interval, is_json)
 	if isinstance(fetchable, pkgtools.ebuild.Artifact):
 		url = fetchable.url
 	else:
@@ -205,6 +288,10 @@ async def get_page(fetchable, encoding=None, refresh_interval=None, is_json=Fals
 		key_dict = {"method_name": "get_page", "url": url, "is_json": is_json}
 		if encoding:
 			key_dict["encoding"] = encoding
+		if not pkgtools.model.immediate:
+			body = get_fresh_result(key_dict, refresh_interval)
+			if body is not None:
+				return body
 		cached_result = await pkgtools.model.fetch_cache.read(
 			key_dict=key_dict
 		)
@@ -217,9 +304,38 @@ async def get_page(fetchable, encoding=None, refresh_interval=None, is_json=Fals
 		# need to HTTP query for any updated resource:
 
 		if datetime.utcnow() - cached_result["fetched_on"] <= refresh_interval:
+			record_fresh_result(key_dict, cached_result["fetched_on"], cached_result["body"])
 			return cached_result['body']
 
-	return await really_get_page(url, encoding=encoding, is_json=is_json, cached_result=cached_result)
+	pending_key = tuple(sorted(key_dict.items()))
+	pending = PENDING_PAGES.get(pending_key)
+	if pending is not None:
+		try:
+			return decode_body(await asyncio.shield(pending))
+		except asyncio.CancelledError:
+			if not pending.cancelled():
+				# We were cancelled ourselves, rather than the fetch we were waiting on:
+				raise
+			# The fetch we were waiting on was cancelled -- so do our own, below.
+
+	pending = PENDING_PAGES[pending_key] = asyncio.get_running_loop().create_future()
+	try:
+		result = await really_get_page(url, encoding=encoding, is_json=is_json, cached_result=cached_result)
+		encoded = encode_body(result)
+		record_fresh_result(key_dict, datetime.utcnow(), result, encoded=encoded)
+		pending.set_result(encoded)
+		return result
+	except asyncio.CancelledError:
+		pending.cancel()
+		raise
+	except BaseException as e:
+		pending.set_exception(e)
+		# Mark the exception as retrieved, so asyncio doesn't complain if nobody else was waiting for it:
+		pending.exception()
+		raise
+	finally:
+		if PENDING_PAGES.get(pending_key) is pending:
+			del PENDING_PAGES[pending_key]
 
 
 async def get_response_headers(fetchable, refresh_interval=None):
@@ -1,5 +1,6 @@
 # tag_gen and release_gen are higher-level functions that return a dict of items, suitable for
 # augmenting the pkginfo dict, and thus easy to integrate into yaml-based autogens.
+import asyncio
 from collections import defaultdict
 
 from metatools.generator.transform import SortMethod, ReleaseRegexMatcher, TagRegexMatcher, RegexMatcher, \
@@ -44,7 +45,10 @@ def fetch_tag_data(hub, github_user, github_repo):
 
 
 def fetch_ref(hub, github_user, github_repo, ref):
-    return hub.pkgtools.fetch.get_page(f"https://api.github.com/repos/{github_user}/{github_repo}/git/refs/{ref}",
+    # Note: the singular /git/ref/ endpoint returns exactly one matching ref. The plural /git/refs/ endpoint does a
+    # prefix match, returning a list (of every tag starting with "1.2" for "tags/1.2", for example) rather than a
+    # single ref when there is more than one match.
+    return hub.pkgtools.fetch.get_page(f"https://api.github.com/repos/{github_user}/{github_repo}/git/ref/{ref}",
                                        is_json=True)
 
 
@@ -115,6 +119,9 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
         raise ValueError("Please specify tarball= or assets=, but not both.")
 
     skip_filters = factor_filters(include)
+    # Resolve these once, so we don't need to iterate over skip_filters for every release:
+    skip_prerelease = "prerelease" in skip_filters
+    skip_draft = "draft" in skip_filters
 
     if not release_data:
         release_data = await fetch_release_data(hub, github_user, github_repo)
@@ -127,7 +134,7 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
         matcher = ReleaseRegexMatcher()
 
     for release in release_data:
-        if any(release[skip] for skip in skip_filters):
+        if (skip_prerelease and release['prerelease']) or (skip_draft and release['draft']):
             continue
         match = matcher.match(release['tag_name'], select=select, filter=filter, transform=transform)
         if match:
@@ -147,9 +154,14 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
     # repos that have multiple 'channels' so the releases may vary and most recent by date may not be what we want.
 
     if sort == SortMethod.VERSION:
-        # Have most recent by version at the beginning:
-        versions_and_release_elements = sorted(versions_and_release_elements, key=lambda v: matcher.sortable(v[0]),
-                                               reverse=True)
+        if tarball or assets:
+            # Have most recent by version at the beginning. We need them all in order, since we may need to fall back
+            # to an older release if assets are missing:
+            versions_and_release_elements = sorted(versions_and_release_elements, key=lambda v: matcher.sortable(v[0]),
+                                                   reverse=True)
+        else:
+            # Only the most recent version will be used, so there's no need to sort everything:
+            versions_and_release_elements = [max(versions_and_release_elements, key=lambda v: matcher.sortable(v[0]))]
 
     # Iterate, starting with most recent version. We will break from this loop if we are successful. Otherwise, we will
     # keep trying the second-most-recent version, etc. This helps us deal with situations where not all assets are available
@@ -158,15 +170,15 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
         try:
             if not len(versions_and_release_elements):
                 raise IndexError("No more GitHub releases available.")
-            upstream_assets_by_name = {}
             version, release = versions_and_release_elements[0]
             versions_and_release_elements = versions_and_release_elements[1:]
             tag_name = release['tag_name']
-            for asset in release['assets']:
-                upstream_assets_by_name[asset['name']] = asset
 
             if tarball or assets:
 
+                # Index this release's assets by name, so we can look up each asset we want directly:
+                upstream_assets_by_name = {asset['name']: asset for asset in release['assets']}
+
                 # We will look for a single specified tarball, or use an assets dict to look for a collection of assets. GitHub calls
                 # these things "assets" officially. "Tarball" is sort of funtoo slang for a single asset. It doesn't need to actually
                 # be a tarball, it just usually is.
@@ -180,14 +192,18 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
                 artifacts = []
                 crates_dict = {}
 
+                # Build the {version}, {tag}, etc. expansion arguments once per release rather than once per asset filename:
+                format_args = dict(kwargs, version=version, github_user=github_user, github_repo=github_repo, tag=tag_name)
+
                 if isinstance(assets, dict):
                     artifacts = defaultdict(list)
                     for asset_key, asset_filenames in assets.items():
                         if not isinstance(asset_filenames, list):
                             asset_filenames = [asset_filenames] # handle bare string
+                        key_format_args = dict(format_args, key=asset_key)
                         for asset_filename in asset_filenames:
                             # expand {version}, etc.
-                            expanded_asset = asset_filename.format(version=version, key=asset_key, github_user=github_user, github_repo=github_repo,tag=tag_name, **kwargs)
+                            expanded_asset = asset_filename.format_map(key_format_args)
                             if expanded_asset in upstream_assets_by_name:
                                 upstream_asset = upstream_assets_by_name[expanded_asset]
                                 artifact = hub.Artifact(url=upstream_asset['browser_download_url'], final_name=expanded_asset)
@@ -204,7 +220,7 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
                 elif isinstance(assets, list):
                     # assets is list:
                     for asset_filename in assets:
-                        expanded_asset = asset_filename.format(version=version, github_user=github_user, github_repo=github_repo, tag=tag_name, **kwargs)
+                        expanded_asset = asset_filename.format_map(format_args)
                         if expanded_asset in upstream_assets_by_name:
                             upstream_asset = upstream_assets_by_name[expanded_asset]
                             artifact = hub.Artifact(url=upstream_asset['browser_download_url'], final_name=expanded_asset)
@@ -264,14 +280,30 @@ async def release_gen(hub, github_user, github_repo, release_data=None, tarball=
 
 
 async def iter_tags_pages(hub, github_user, github_repo):
+    """
+    Yield each page of tags for a GitHub repository. While the caller is processing one page, the next page is
+    already being fetched, so that we are not waiting on one round-trip to GitHub per page in sequence.
+    """
+
+    def fetch_page(page):
+        return asyncio.ensure_future(hub.pkgtools.fetch.get_page(
+            f"https://api.github.com/repos/{github_user}/{github_repo}/tags?per_page=100&page={page}", is_json=True))
+
     page = 1
-    while True:
-        current_page = await hub.pkgtools.fetch.get_page(
-            f"https://api.github.com/repos/{github_user}/{github_repo}/tags?per_page=100&page={page}", is_json=True)
-        if not len(current_page):
-            break
-        yield current_page
-        page += 1
+    next_page = fetch_page(page)
+    try:
+        while True:
+            current_page = await next_page
+            if not len(current_page):
+                break
+            page += 1
+            next_page = fetch_page(page)
+            yield current_page
+    finally:
+        if not next_page.done():
+            # The caller stopped iterating early -- we don't need the page we were prefetching:
+            next_page.cancel()
+            next_page.add_done_callback(lambda task: task.cancelled() or task.exception())
 
 
 async def iter_all_tags(hub, github_user, github_repo):
@@ -1,4 +1,3 @@
-import glob
 import hashlib
 import os
 import shutil
@@ -162,13 +161,13 @@ async def add_gosum_bundle(hub, pkginfo, gosum_data=None, gosum_path=None, src_a
 
 	if src_artifact:
 		await src_artifact.ensure_fetched()
-		src_artifact.extract()
-		src_dir = glob.glob(os.path.join(src_artifact.extract_path, src_dir_glob))[0]
+		await src_artifact.extract_async()
+		src_dir = src_artifact.find_extracted(src_dir_glob)
 		gosum_path = os.path.join(src_dir, "go.sum")
 		if not os.path.exists(gosum_path):
 			subprocess.Popen(["go", "mod", "download"], cwd=src_dir).wait()
 		gosum, pkginfo["gosum_bundle"].mod_attrs_list = gen_gosum(gosum_path=gosum_path)
-		src_artifact.cleanup()
+		await src_artifact.cleanup_async()
 	elif gosum_path:
 		gosum, pkginfo["gosum_bundle"].mod_attrs_list = gen_gosum(gosum_path=gosum_path)
 	else:
@@ -201,11 +200,11 @@ async def generate_gosum_from_artifact(src_artifact, src_dir_glob="*"):
 	``go.sum`` present in the artifact, ``go mod download`` will be run to generate one.
 	"""
 	await src_artifact.fetch()
-	src_artifact.extract()
-	src_dir = glob.glob(os.path.join(src_artifact.extract_path, src_dir_glob))[0]
+	await src_artifact.extract_async()
+	src_dir = src_artifact.find_extracted(src_dir_glob)
 	gosum_path = os.path.join(src_dir, "go.sum")
 	if not os.path.exists(gosum_path):
 		subprocess.Popen(["go", "mod", "download"], cwd=src_dir).wait()
 	artifacts = await get_gosum_artifacts(gosum_path)
-	src_artifact.cleanup()
+	await src_artifact.cleanup_async()
 	return artifacts
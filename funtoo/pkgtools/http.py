@@ -3,7 +3,7 @@
 import dyne.org.funtoo.metatools.pkgtools as pkgtools
 import httpx
 
-from metatools.fastpull.spider import FetchRequest
+from metatools.fastpull.spider import FetchError, FetchRequest
 
 """
 This sub implements lower-level HTTP fetching logic, such as actually grabbing the data, sending the
@@ -36,9 +36,18 @@ async def get_response_headers(url):
 	This function will take a URL and grab its response headers. This is useful for obtaining
 	information about a URL without fetching its body.
 	"""
-	async with httpx.AsyncClient() as client:
-		resp = await client.get(url=url, follow_redirects=True)
-		return resp.headers
+	request = FetchRequest(url=url)
+	pkgtools.fetch.set_basic_auth(request)
+	# Use the spider's HTTP client so we can reuse its pooled connections:
+	client = pkgtools.model.spider.acquire_http_client(request)
+	headers, auth = pkgtools.model.spider.get_headers_and_auth(request)
+	try:
+		# Stream the response and close it without reading the body -- we only want the headers:
+		async with client.stream("GET", url=url, headers=headers, auth=auth, follow_redirects=True) as resp:
+			pass
+	except httpx.RequestError as e:
+		raise FetchError(request, f"Couldn't get_response_headers due to exception {repr(e)}", retry=True)
+	return resp.headers
 
 
 # vim: ts=4 sw=4 noet
@@ -1,10 +1,15 @@
+import asyncio
 import shutil
 from enum import Enum
-import glob
 import json
 import os.path
 import subprocess
 
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
 
 class MesonError(Exception):
 	def __init__(self, msg):
@@ -85,8 +90,12 @@ def get_build_options(src_dir):
 	build_info_dir = get_build_info_dir(src_dir)
 	build_options_path = os.path.join(build_info_dir, "intro-buildoptions.json")
 
-	with open(build_options_path, "r") as build_options_file:
-		return json.load(build_options_file, object_hook=lambda data: MesonBuildOption(**data))
+	with open(build_options_path, "rb") as build_options_file:
+		raw = build_options_file.read()
+	# Meson's build options are a flat list of option objects. Only wrap the top-level entries: an object_hook would
+	# also (wrongly) be applied to any nested objects.
+	options = orjson.loads(raw) if orjson else json.loads(raw)
+	return [MesonBuildOption(**option) for option in options]
 
 
 async def get_build_options_from_artifact(src_artifact, src_dir_glob="*"):
@@ -101,12 +110,13 @@ async def get_build_options_from_artifact(src_artifact, src_dir_glob="*"):
 	:rtype list[MesonBuildOption]
 	"""
 	await src_artifact.fetch()
-	src_artifact.extract()
+	await src_artifact.extract_async()
 
-	src_dir = glob.glob(os.path.join(src_artifact.extract_path, src_dir_glob))[0]
-	build_options = get_build_options(src_dir)
+	src_dir = src_artifact.find_extracted(src_dir_glob)
+	# Running meson can take a while, so do it in a worker thread so we don't block the event loop meanwhile:
+	build_options = await asyncio.get_running_loop().run_in_executor(None, get_build_options, src_dir)
 
-	src_artifact.cleanup()
+	await src_artifact.cleanup_async()
 	# It is good to return a sorted list so any programmatic use of this data in ebuilds will
 	# produce the options in a deterministic order (avoiding randomized order):
 	return list(sorted(build_options, key=lambda x: x.name))
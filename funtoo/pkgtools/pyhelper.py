@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import functools
 import logging
 from collections import defaultdict
 
@@ -222,16 +223,13 @@ def pypi_get_artifact_url(pkginfo, json_dict, strict=False, has_python=None, req
 		return sdist_package["url"]
 
 
-def expand_pydep(pkginfo, pyatom):
+@functools.lru_cache(maxsize=65536)
+def _expand_pydep(pyatom):
 	"""
-	Takes something from our pydeps YAML that might be "foo", or "sys-apps/foo", or "foo >= 1.2" and convert to
-	the proper Gentoo atom format.
+	Does the actual work for ``expand_pydep()``. The same pydeps show up over and over again across a run, and this
+	doesn't depend on pkginfo, so results are cached. Returns None if ``pyatom`` is invalid.
 	"""
-	# TODO: support ranges?
-	# TODO: pass a ctx variable here so we can have useful error messages about what pkg is triggering the error.
 	psp = pyatom.split()
-	if not len(psp):
-		raise ValueError(f"{pkginfo['cat']}/{pkginfo['name']} appears to have invalid pydeps. Make sure each pydep is specified as a YAML list item starting with '-'.")
 	if psp[0] == "not!":
 		block = "!"
 		psp = psp[1:]
@@ -250,8 +248,22 @@ def expand_pydep(pkginfo, pyatom):
 		else:
 			# inject dev-python
 			return f"{block}dev-python/{psp[0]}[${{PYTHON_USEDEP}}]"
-	else:
+	return None
+
+
+def expand_pydep(pkginfo, pyatom):
+	"""
+	Takes something from our pydeps YAML that might be "foo", or "sys-apps/foo", or "foo >= 1.2" and convert to
+	the proper Gentoo atom format.
+	"""
+	# TODO: support ranges?
+	# TODO: pass a ctx variable here so we can have useful error messages about what pkg is triggering the error.
+	if not pyatom.split():
+		raise ValueError(f"{pkginfo['cat']}/{pkginfo['name']} appears to have invalid pydeps. Make sure each pydep is specified as a YAML list item starting with '-'.")
+	atom = _expand_pydep(pyatom)
+	if atom is None:
 		raise ValueError(f"{pkginfo['cat']}/{pkginfo['name']} appears to have an invalid pydep '{pyatom}'.")
+	return atom
 
 
 def create_ebuild_cond_dep(pkginfo, pydeplabel, atoms):
@@ -260,7 +272,6 @@ def create_ebuild_cond_dep(pkginfo, pydeplabel, atoms):
 	conditional dependency for inclusion in an ebuild. It returns a list of lines (without newline termination,
 	each string in the list implies a separate line.)
 	"""
-	out_atoms = []
 	pyspec = None
 	usespec = None
 	if pydeplabel.dep_type == "py":
@@ -268,18 +279,16 @@ def create_ebuild_cond_dep(pkginfo, pydeplabel, atoms):
 	elif pydeplabel.dep_type == "use":
 		usespec = list(pydeplabel.specifiers)[0]
 
-	for atom in atoms:
-		out_atoms.append(expand_pydep(pkginfo, atom))
+	out_atoms = [expand_pydep(pkginfo, atom) for atom in atoms]
 
 	if usespec:
-		out = [f"{usespec}? ( {' '.join(sorted(out_atoms))} )"]
+		return [f"{usespec}? ( {' '.join(sorted(out_atoms))} )"]
 	elif not len(pyspec):
 		# no condition -- these deps are for all python versions, so not a conditional dep:
-		out = out_atoms
+		return out_atoms
 	else:
-		# stuff everything into a python_gen_cond_dep:
-		out = [r"$(python_gen_cond_dep '" + ' '.join(sorted(out_atoms)) + r"' " + " ".join(sorted(pyspec)) + ")"]
-	return out
+		# stuff everything into a single, pre-joined python_gen_cond_dep line:
+		return [f"$(python_gen_cond_dep '{' '.join(sorted(out_atoms))}' {' '.join(sorted(pyspec))})"]
 
 
 class InvalidPyDepLabel(Exception):
@@ -406,6 +415,15 @@ class ParsedPyDepLabel:
 		return out
 
 
+@functools.lru_cache(maxsize=1024)
+def parse_pydep_label(pydep_label):
+	"""
+	Return a (shared) ``ParsedPyDepLabel`` for ``pydep_label``. Only a handful of distinct labels such as "py:all" are
+	used across all our pydeps, so we only parse each one once.
+	"""
+	return ParsedPyDepLabel(pydep_label)
+
+
 def expand_pydeps(pkginfo, compat_mode=False, compat_ebuild=False):
 	expanded_pydeps = defaultdict(list)
 	if "pydeps" in pkginfo:
@@ -416,7 +434,7 @@ def expand_pydeps(pkginfo, compat_mode=False, compat_ebuild=False):
 				expanded_pydeps["rdepend"].append(expand_pydep(pkginfo, dep))
 		elif pytype == dict:
 			for label_str, deps in pkginfo["pydeps"].items():
-				label = ParsedPyDepLabel(label_str)
+				label = parse_pydep_label(label_str)
 				if compat_mode:
 					if compat_ebuild and not label.py2_enabled:
 						continue
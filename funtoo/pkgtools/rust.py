@@ -1,7 +1,5 @@
 import glob
 import os
-import subprocess
-import toml
 import asyncio
 import hashlib
 import shutil
@@ -12,6 +10,16 @@ from subpop.util import AttrDict
 
 from metatools.cmd import run_shell
 
+# Cargo.lock files can be tens of thousands of lines long, so prefer a faster TOML parser when one is available. All of
+# these provide a compatible loads():
+try:
+	import tomllib as toml
+except ImportError:
+	try:
+		import tomli as toml
+	except ImportError:
+		import toml
+
 # TODO: although this is currently working, it's not recommended.
 #       we should look into using non-dyne references to these classes more.
 # from funtoo.pkgtools.ebuild import Artifact, Archive
@@ -69,19 +77,19 @@ async def add_crates_bundle(
 
 	if src_artifact:
 		await src_artifact.ensure_fetched()
-		src_artifact.extract()
+		await src_artifact.extract_async()
 
-		src_dir = glob.glob(os.path.join(src_artifact.extract_path, src_dir_glob))[0]
+		src_dir = src_artifact.find_extracted(src_dir_glob)
 
 		cargo_lock_path = os.path.join(src_dir, "Cargo.lock")
 		if not os.path.exists(cargo_lock_path):
-			cargo_cmd = subprocess.Popen(["cargo", "update"], cwd=src_dir).wait()
+			await run_shell(["cargo", "update"], chdir=src_dir)
 
 		crates, pkginfo["crates_bundle"].crates_artifacts = await generate_crates_metadata(
 			lock_path=cargo_lock_path
 		)
 
-		src_artifact.cleanup()
+		await src_artifact.cleanup_async()
 	elif cargo_lock_data:
 		crates, pkginfo["crates_bundle"].crates_artifacts = await generate_crates_metadata(
 			lock_data=cargo_lock_data
@@ -248,8 +256,9 @@ async def generate_crates_metadata(lock_path=None, lock_data=None):
 
 	crates_dict = toml.loads(lock_data)
 
-	crates = ""
+	crate_lines = []
 	crates_artifacts = []
+	Artifact = pkgtools.ebuild.Artifact
 
 	git_crates = defaultdict(list)
 
@@ -279,21 +288,14 @@ async def generate_crates_metadata(lock_path=None, lock_data=None):
 
 			git_crates[url].append(name)
 
-		crates = crates + name + "-" + version + "\n"
+		crate_lines.append(f"{name}-{version}\n")
 
 		if source_origin == "crates":
 			final_name = f"{name}-{version}.crate"
 
 			crates_artifacts.append(
-				# Artifact(
-				pkgtools.ebuild.Artifact(
-					url=(
-							"https://crates.io/api/v1/crates/"
-							+ name
-							+ "/"
-							+ version
-							+ "/download"
-					),
+				Artifact(
+					url=f"https://crates.io/api/v1/crates/{name}/{version}/download",
 					final_name=final_name,
 				)
 			)
@@ -303,7 +305,7 @@ async def generate_crates_metadata(lock_path=None, lock_data=None):
 
 		crates_artifacts.append(git_archive)
 
-	return crates, crates_artifacts
+	return "".join(crate_lines), crates_artifacts
 
 
 async def generate_crates_from_artifact(src_artifact, src_dir_glob="*"):
@@ -319,9 +321,9 @@ async def generate_crates_from_artifact(src_artifact, src_dir_glob="*"):
 	``Cargo.lock`` present in the artifact, ``cargo update`` will be run to generate one.
 	"""
 	await src_artifact.fetch()
-	src_artifact.extract()
+	await src_artifact.extract_async()
 
-	src_dir = glob.glob(os.path.join(src_artifact.extract_path, src_dir_glob))[0]
+	src_dir = src_artifact.find_extracted(src_dir_glob)
 
 	cargo_lock_path = os.path.join(src_dir, "Cargo.lock")
 	if not os.path.exists(cargo_lock_path):
@@ -329,6 +331,6 @@ async def generate_crates_from_artifact(src_artifact, src_dir_glob="*"):
 
 	crates, crates_artifacts = await generate_crates_metadata(lock_path=cargo_lock_path)
 
-	src_artifact.cleanup()
+	await src_artifact.cleanup_async()
 
 	return dict(crates=crates, crates_artifacts=crates_artifacts)
@@ -18,9 +18,11 @@ class BaseLayerObjectStore(Store):
 	def insert_download(self, download: Download):
 		"""
 		This is the method used to insert a Download into the BLOS which already has hashes
-		we can use.
+		we can use. These are calculated by the Spider while the response body is streamed to
+		disk, so the file is never re-read and re-hashed here.
 		"""
 		# TODO: make this asyncio so it does not block!
+		assert download.final_data is not None, f"Download of {download.request.url} has no streamed hashes."
 		return self.write({"hashes": download.final_data}, blob_path=download.temp_path)
 
 	def insert_blob(self, blob_path):
@@ -1,4 +1,5 @@
 import asyncio
+import shlex
 
 
 async def capture_bg(cmd):
@@ -16,6 +17,22 @@ async def capture_bg(cmd):
 	return proc, stdout.decode("utf-8")
 
 
+async def capture_exec(args, cwd=None):
+	"""
+	Like ``capture_bg()``, but run the argument list ``args`` directly rather than via ``/bin/sh -c``. This avoids
+	spawning an extra shell and means that arguments never need to be quoted.
+
+	Return the process object and the combined string of stdout and stderr.
+	"""
+	proc = await asyncio.create_subprocess_exec(*args,
+	cwd=cwd,
+	stdout=asyncio.subprocess.PIPE,
+	stderr=asyncio.subprocess.STDOUT)
+
+	stdout, stderr = await proc.communicate()
+	return proc, stdout.decode("utf-8")
+
+
 async def run_bg(cmd, env=None):
 	"""
 	Run command in a forked background process, await its completion -- output all its output to existing stdout/err.
@@ -30,16 +47,25 @@ class ShellError(Exception):
 
 
 async def run_shell(cmd_list, abort_on_failure=True, chdir=None, logger=None):
+	"""
+	Run a command, raising ``ShellError`` if it fails (or returning False if ``abort_on_failure`` is False).
+
+	A string is run via the shell. A list is treated as an argument list and executed directly, without a shell, so
+	no shell syntax (quoting, globs, redirection) is interpreted.
+	"""
 	if isinstance(cmd_list, list):
-		cmd_str = " ".join(cmd_list)
+		cmd_str = " ".join(shlex.quote(arg) for arg in cmd_list)
 	else:
 		cmd_str = cmd_list
 	if logger:
 		logger.info(f"executing: {cmd_str}")
-	if chdir:
-		cmd_str = f"( cd {chdir}; {cmd_str})"
 
-	proc, output = await capture_bg(cmd_str)
+	if isinstance(cmd_list, list):
+		proc, output = await capture_exec(cmd_list, cwd=chdir)
+	else:
+		if chdir:
+			cmd_str = f"( cd {chdir}; {cmd_str})"
+		proc, output = await capture_bg(cmd_str)
 
 	if proc.returncode != 0:
 		if abort_on_failure:
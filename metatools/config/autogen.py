@@ -2,8 +2,6 @@ import os
 from collections import defaultdict
 from datetime import timedelta
 
-import yaml
-
 from metatools.blos import BaseLayerObjectStore
 from metatools.config.base import MinimalConfig
 from metatools.context import OverlayLocator, GitRepositoryLocator
@@ -14,6 +12,7 @@ from metatools.tree import GitTree
 from metatools.zmq.app_core import DealerConnection
 from metatools.zmq.zmq_msg_breezyops import BreezyMessage, MessageType
 from metatools.release import ReleaseYAML
+from metatools.yaml_util import safe_load
 
 
 class StoreConfig(MinimalConfig):
@@ -63,6 +62,7 @@ class AutogenConfig(StoreSpiderConfig):
 	fetch_cache_interval = None
 	manifest_lines = defaultdict(set)
 	fetch_attempts = 3
+	max_fetch_concurrency = 8
 	config = None
 	kit_spy = None
 	kit_fixups = None
@@ -131,7 +131,7 @@ class AutogenConfig(StoreSpiderConfig):
 		if self.filter_cat or self.filter_pkg:
 			self.filter = True
 
-		self.config = yaml.safe_load(self.get_file("autogen"))
+		self.config = safe_load(self.get_file("autogen"))
 		# Set to empty values if non-existent:
 		if self.config is None:
 			self.config = {}
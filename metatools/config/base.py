@@ -93,6 +93,14 @@ class MinimalConfig(SubPopModel):
 	def metadata_cache(self):
 		return os.path.join(self.work_path, "metadata-cache")
 
+	@property
+	def jinja_cache_path(self):
+		"""
+		Jinja bytecode cache for ebuild templates, so that templates do not need to be recompiled every time
+		'doit' runs.
+		"""
+		return os.path.join(self.work_path, "jinja-cache")
+
 	@property
 	def dest_trees(self):
 		return os.path.join(self.work_path, "dest-trees")
@@ -3,6 +3,7 @@ import hashlib
 import logging
 import os
 import random
+import re
 import ssl
 import string
 import threading
@@ -16,11 +17,33 @@ from urllib.parse import urlparse
 import httpx
 import rich.progress
 
+try:
+	# orjson is considerably faster for decoding the large JSON API responses we fetch, and can decode the raw
+	# response bytes directly. Its JSONDecodeError is a subclass of json.JSONDecodeError.
+	from orjson import loads as json_loads
+except ImportError:
+	from json import loads as json_loads
+
 log = logging.getLogger('metatools.autogen')
 
+PROGRESS_UPDATE_BYTES = 1024 * 1024
+
+# Size of the chunks handed to on_chunk() when streaming a download. Network reads are often much smaller than this,
+# so rebuffering them means far fewer per-chunk hash updates and file writes for large distfiles:
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Maximum number of bytes of an HTTP error response body that we will include in error messages:
+ERROR_BODY_BYTES = 512
+
+
+# Matches the hostname (or bracketed IPv6 address) in a URL, skipping any user:password@ credentials:
+HOSTNAME_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?(\[[^\]/?#]*\]|[^:/?#\[]+)")
+
 
 class FetchRequest:
 
+	_hostname = None
+
 	def __init__(self, url, retry=True, extra_headers=None, mirror_urls=None, username=None, password=None,
 	             expected_hashes=None, final_name=None):
 		assert url is not None
@@ -37,8 +60,15 @@ class FetchRequest:
 
 	@property
 	def hostname(self):
-		parsed_url = urlparse(self.url)
-		return parsed_url.hostname
+		# This is looked up several times for each request (fetch slots, HTTP clients, authentication), so extract it
+		# once with a simple regex rather than fully parsing the URL each time:
+		if self._hostname is None:
+			match = HOSTNAME_RE.match(self.url)
+			if match:
+				self._hostname = match.group(1).strip("[]").lower()
+			else:
+				self._hostname = urlparse(self.url).hostname
+		return self._hostname
 
 	@property
 	def filename(self):
@@ -136,7 +166,7 @@ class Download:
 		Also note that this method will now raise FetchError if it truly fails, though it also will capture some error
 		conditions internally do to proper robustifying of downloads and handle common download failure conditions itself.
 		"""
-		client = await self.spider.acquire_http_client(self.request)
+		client = self.spider.acquire_http_client(self.request)
 		headers, auth = self.spider.get_headers_and_auth(self.request)
 
 		attempts = 0
@@ -201,7 +231,7 @@ class Download:
 						self.download_task = self.spider.progress.add_task("Download", filename=filename, total=self.xfer_bytes_total)
 						log.debug(f"Added download task {self.download_task}, total {self.xfer_bytes_total}")
 					# DO NOT USE aiter_raw(), below!! It will result in invalid downloads from some sites!
-					async for chunk in response.aiter_bytes():
+					async for chunk in response.aiter_bytes(chunk_size=STREAM_CHUNK_SIZE):
 						bytes_received = on_chunk(chunk, response)
 						self.decoded_bytes_received += bytes_received
 						if bytes_received:
@@ -270,11 +300,13 @@ class Download:
 		self.fd.write(chunk)
 		for hash in self.hashes:
 			self.hash_calc_dict[hash].update(chunk)
-		if self.download_task is not None:
+		received = self.decoded_bytes_received + got_bytes
+		# Only update the progress display once per PROGRESS_UPDATE_BYTES, rather than for every (small) chunk:
+		if self.download_task is not None and received // PROGRESS_UPDATE_BYTES != self.decoded_bytes_received // PROGRESS_UPDATE_BYTES:
 			if self.xfer_bytes_total:
-				self.spider.progress.update(self.download_task, completed=self.decoded_bytes_received)
+				self.spider.progress.update(self.download_task, completed=received)
 			else:
-				self.spider.progress.update(self.download_task, completed=self.decoded_bytes_received, total=self.decoded_bytes_received)
+				self.spider.progress.update(self.download_task, completed=received, total=received)
 		return got_bytes
 
 	async def launch(self) -> None:
@@ -373,11 +405,15 @@ class WebSpider:
 	DOWNLOAD_SLOT is the mechanism we used to ensure we only have a certain number (specified by the
 	value= parameter) of downloads active at once. Each active download will acquire a slot. When all
 	slots are exhausted, any pending downloads will wait for an active slot before they can begin.
+
+	DOWNLOAD_HOST_SLOT additionally limits how many of these downloads can be active against any one host at
+	once, so that we don't get throttled by (or hammer) a single server when many distfiles come from it.
 	"""
 
 	DL_ACTIVE_LOCK = threading.Lock()
 	DL_ACTIVE = dict()
 	DOWNLOAD_SLOT = threading.Semaphore(value=20)
+	DOWNLOAD_HOST_SLOT = defaultdict(lambda: threading.Semaphore(value=8))
 	FETCH_SLOT = defaultdict(lambda: threading.Semaphore(value=20))
 	fetch_headers = {"User-Agent": "funtoo-metatools (support@funtoo.org)"}
 	status_logger_task = None
@@ -385,7 +421,9 @@ class WebSpider:
 	thread_ctx = threading.local()
 	transport = None
 	started = None
-	limits = httpx.Limits(keepalive_expiry=30, max_keepalive_connections=100, max_connections=100)
+	# httpx only resolves a hostname when it opens a new connection, so keeping idle pooled connections around for a
+	# while also serves as our DNS cache for the hosts that autogen hits over and over (GitHub, PyPI, crates.io, ...):
+	limits = httpx.Limits(keepalive_expiry=60, max_keepalive_connections=100, max_connections=100)
 
 	def __init__(self, temp_path, hashes):
 		self.fetch_count = 0
@@ -431,14 +469,20 @@ class WebSpider:
 		"""
 		request = FetchRequest(url=url)
 		logging.info(f"Getting redirect URL from {url}...")
-		client = await self.acquire_http_client(request)
+		client = self.acquire_http_client(request)
+		headers, auth = self.get_headers_and_auth(request)
 
 		try:
-			resp = await client.get(url=url, follow_redirects=False)
-			if resp.status_code == 302:
+			# We only need the headers, so use HEAD, so that nothing is downloaded if the URL doesn't redirect:
+			resp = await client.head(url=url, headers=headers, auth=auth, follow_redirects=False)
+			if resp.status_code in (405, 501):
+				# HEAD isn't supported by this server. Fall back to GET, but stream it so we don't read the body:
+				async with client.stream("GET", url=url, headers=headers, auth=auth, follow_redirects=False) as resp:
+					pass
+			if resp.is_redirect:
 				return resp.headers["location"]
 		except httpx.RequestError as e:
-			raise FetchError(url, f"Couldn't get_url_from_redirect due to exception {repr(e)}")
+			raise FetchError(request, f"Couldn't get_url_from_redirect due to exception {repr(e)}")
 
 	async def start(self):
 		if self.started:
@@ -446,7 +490,7 @@ class WebSpider:
 		# This turns on periodic logging of active downloads (to get rid of 'dots')
 		self.progress.start()
 		await self.start_asyncio_tasks()
-		self.transport = httpx.AsyncHTTPTransport(retries=3, limits=self.limits)
+		self.started = True
 
 	async def stop(self):
 		if not self.started:
@@ -471,6 +515,21 @@ class WebSpider:
 			#     raise ValueError("Invalid file descriptor: {}".format(fd))
 			# ValueError: Invalid file descriptor: -1
 			pass
+		await self.close_http_clients()
+
+	async def close_http_clients(self):
+		"""
+		Close this thread's pooled HTTP clients, and the shared transport, so that their keep-alive connections are
+		shut down cleanly rather than being left for garbage collection.
+		"""
+		http_clients = self.http_clients
+		while http_clients:
+			_, client = http_clients.popitem()
+			await client.aclose()
+		if self.transport is not None:
+			transport = self.transport
+			self.transport = None
+			await transport.aclose()
 
 	async def download(self, request: FetchRequest, completion_pipeline=None):
 		if not self.started:
@@ -504,7 +563,7 @@ class WebSpider:
 		else:
 			log.debug(f"Webspider.download:{threading.get_ident()} starting new download for {request.url}")
 			download = Download(self, request, hashes=self.hashes, completion_pipeline=completion_pipeline)
-			async with self.acquire_download_slot():
+			async with self.acquire_download_slot(request):
 				async with self.start_download(download):
 					try:
 						# This will actually fire off the download, and also handle calling the completion pipeline,
@@ -528,24 +587,37 @@ class WebSpider:
 				# FL-8301: address possible race condition
 				pass
 
-	async def acquire_http_client(self, request):
-		headers, auth = self.get_headers_and_auth(request)
-		client = self.http_clients[request.hostname] = httpx.AsyncClient(transport=self.transport, http2=True,
-																		 base_url=request.hostname, headers=headers,
-																		 auth=auth, follow_redirects=True,
-																		 timeout=8)
-		# httpx seems to cache these, which is bad. We don't want these from a previous client:
-		for strip_header in ["If-None-Match", "If-Modified-Since"]:
-			if strip_header in client.headers:
-				del client.headers[strip_header]
+	def get_transport(self):
+		"""
+		All our HTTP clients share a single transport, so that they share one connection pool -- this allows
+		connections (including TLS handshakes) to be reused across requests to the same host, and allows HTTP/2
+		requests to be multiplexed over them. Note that the ``http2=`` setting of ``httpx.AsyncClient`` is ignored
+		when a transport is passed to it, so it needs to be enabled here.
+		"""
+		if self.transport is None:
+			self.transport = httpx.AsyncHTTPTransport(http2=True, retries=3, limits=self.limits)
+		return self.transport
+
+	def acquire_http_client(self, request):
+		"""
+		Return an HTTP client to use for ``request``. Clients are reused for each host rather than being created for
+		every request, so request-specific headers and authentication must be passed with each request -- use
+		``get_headers_and_auth()`` to get these.
+
+		This is a plain (non-async) method since it never needs to wait for anything, so callers on the fetch path
+		don't pay for an extra ``await``.
+		"""
+		client = self.http_clients.get(request.hostname)
+		if client is None:
+			client = self.http_clients[request.hostname] = httpx.AsyncClient(transport=self.get_transport(),
+																			 http2=True, headers=self.fetch_headers,
+																			 follow_redirects=True, timeout=8)
 		return client
 
 	def get_headers_and_auth(self, request):
-		if request.extra_headers:
-			headers = self.fetch_headers.copy()
-			headers.update(request.extra_headers)
-		else:
-			headers = self.fetch_headers
+		# fetch_headers are already the default headers of every client from acquire_http_client(), so we only need
+		# to return the request-specific ones. Always return a new dict, since callers may add headers to it:
+		headers = dict(request.extra_headers) if request.extra_headers else {}
 		if request.username and request.password:
 			auth = (request.username, request.password)
 		else:
@@ -592,9 +664,8 @@ I have a bug open to try to fix this.
 New logic:"""
 		async with self.acquire_fetch_slot(request):
 			accept_304 = False
-			http_client = await self.acquire_http_client(request)
+			http_client = self.acquire_http_client(request)
 			headers, auth = self.get_headers_and_auth(request)
-			# TODO: add code to explicitly close all clients, above:
 			try:
 				# All 304-related headers should come in through extra_headers ONLY:
 				if extra_headers:
@@ -610,47 +681,51 @@ New logic:"""
 						else:
 							del headers[key_304]
 
-				response = await http_client.get(request.url, headers=headers, auth=auth, follow_redirects=True, timeout=15)
-				log.debug(f'http_fetch: GET {response.status_code} {request.url}')
-				if accept_304 and response.status_code == 304:
-					raise ContentNotModified()
-				if response.status_code != 200:
-					if response.status_code in [400, 404, 410]:
-						# No need to retry as the server has just told us that the resource does not exist.
-						retry = False
+				async with http_client.stream("GET", request.url, headers=headers, auth=auth, follow_redirects=True, timeout=15) as response:
+					log.debug(f'http_fetch: GET {response.status_code} {request.url}')
+					if accept_304 and response.status_code == 304:
+						raise ContentNotModified()
+					if response.status_code != 200:
+						if response.status_code in [400, 404, 410]:
+							# No need to retry as the server has just told us that the resource does not exist.
+							retry = False
+						else:
+							retry = True
+						# Error pages can be large HTML documents -- only download enough of the body to be useful in the log:
+						err_body = b""
+						async for chunk in response.aiter_bytes():
+							err_body += chunk
+							if len(err_body) >= ERROR_BODY_BYTES:
+								break
+						err_response = err_body[:ERROR_BODY_BYTES].decode("utf-8", errors="replace").strip()
+						log.error(
+							f"Fetch failure for {request.url}: {response.status_code} {response.reason_phrase} {err_response}")
+						if response.status_code == 304:
+							log.error("We should not get status 304 (not modified) but we did.")
+							log.error(f"  client request headers: {repr(http_client.headers)}")
+							log.error(f"headers passed to client: {repr(headers)} with auth: {repr(auth)}")
+							log.error(f"Extra headers:            {repr(extra_headers)}")
+						raise FetchError(request,
+						                 f"HTTP fetch Error: {request.url}: {response.status_code}: {response.reason_phrase} {err_response}",
+						                 retry=retry)
+					await response.aread()
+					if is_json:
+						try:
+							return response.headers, json_loads(response.content)
+						except JSONDecodeError as jde:
+							# TODO: report this via moonbeam
+							raise FetchError(request, f"Error decoding JSON: {repr(jde)}", retry=False)
+					if encoding:
+						result = response.headers, response.content.decode(encoding)
 					else:
-						retry = True
-					try:
-						err_response = response.json()
-					except JSONDecodeError:
-						err_response = response.text
-					log.error(
-						f"Fetch failure for {request.url}: {response.status_code} {response.reason_phrase} {err_response}")
-					if response.status_code == 304:
-						log.error("We should not get status 304 (not modified) but we did.")
-						log.error(f"  client request headers: {repr(http_client.headers)}")
-						log.error(f"headers passed to client: {repr(headers)} with auth: {repr(auth)}")
-						log.error(f"Extra headers:            {repr(extra_headers)}")
-					raise FetchError(request,
-					                 f"HTTP fetch Error: {request.url}: {response.status_code}: {response.reason_phrase} {err_response}",
-					                 retry=retry)
-				if is_json:
-					try:
-						return response.headers, response.json()
-					except JSONDecodeError as jde:
-						# TODO: report this via moonbeam
-						raise FetchError(request, f"Error decoding JSON: {repr(jde)}", retry=False)
-				if encoding:
-					result = response.headers, response.content.decode(encoding)
-				else:
-					result = response.headers, response.text
-				return result
+						result = response.headers, response.text
+					return result
 			except (httpx.RequestError, ssl.SSLError) as re:
 				# TODO: report this via moonbeam
 				raise FetchError(request, f"Could not connect to {request.url}: {repr(re)}", retry=False)
 
 	@asynccontextmanager
-	async def acquire_download_slot(self):
+	async def acquire_download_slot(self, request):
 		"""
 		If you are inside this contextmanager, then it means you *have permission to start a download*.
 
@@ -667,34 +742,37 @@ New logic:"""
 		succeed -- great. If not, we will asyncio loop to repeatedly attempt to acquire the slot with a slight delay
 		between each attempt. This ensures that the ioloop can continue to function and release any download slots while
 		we wait.
+
+		We wait for a slot for ``request``'s host first, so that downloads queued up behind a busy host do not tie up
+		global download slots that downloads from other hosts could be using.
 		"""
+		host_slot = self.DOWNLOAD_HOST_SLOT[request.hostname]
+		while not host_slot.acquire(blocking=False):
+			await asyncio.sleep(0.1)
+			logging.info("WAITING ON HOST SLOT")
+		# Only release once we have actually acquired the slot -- if we are cancelled while waiting, we must not:
 		try:
-			while True:
-				success = self.DOWNLOAD_SLOT.acquire(blocking=False)
-				if not success:
-					await asyncio.sleep(0.1)
-					logging.info("WAITING ON SLOT")
-					continue
+			while not self.DOWNLOAD_SLOT.acquire(blocking=False):
+				await asyncio.sleep(0.1)
+				logging.info("WAITING ON SLOT")
+			try:
 				yield
-				break
+			finally:
+				self.DOWNLOAD_SLOT.release()
 		finally:
-			self.DOWNLOAD_SLOT.release()
+			host_slot.release()
 
 	@asynccontextmanager
 	async def acquire_fetch_slot(self, request):
+		fetch_slot = self.FETCH_SLOT[request.hostname]
+		while not fetch_slot.acquire(blocking=False):
+			await asyncio.sleep(0.1)
+			logging.info("WAITING ON SLOT")
+		self.fetch_count += 1
 		try:
-			while True:
-				success = self.FETCH_SLOT[request.hostname].acquire(blocking=False)
-				if not success:
-					await asyncio.sleep(0.1)
-					logging.info("WAITING ON SLOT")
-					continue
-				else:
-					self.fetch_count += 1
-				yield
-				break
+			yield
 		finally:
-			self.FETCH_SLOT[request.hostname].release()
+			fetch_slot.release()
 
 	@asynccontextmanager
 	async def start_download(self, download):
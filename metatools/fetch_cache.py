@@ -79,8 +79,13 @@ class MongoDBFetchCache(FetchCache):
 
 	def __init__(self):
 		self.fc = get_collection('fetch_cache')
-		self.fc.create_index([("method_name", pymongo.ASCENDING), ("url", pymongo.ASCENDING)])
-		self.fc.create_index("last_failure_on", partialFilterExpression={"last_failure_on": {"$exists": True}})
+		# Our indexes normally exist already, so check for them with a single round-trip and only create missing ones,
+		# rather than issuing a create_index() round-trip for each of them every time we start up:
+		existing_indexes = self.fc.index_information()
+		if "method_name_1_url_1" not in existing_indexes:
+			self.fc.create_index([("method_name", pymongo.ASCENDING), ("url", pymongo.ASCENDING)])
+		if "last_failure_on_1" not in existing_indexes:
+			self.fc.create_index("last_failure_on", partialFilterExpression={"last_failure_on": {"$exists": True}})
 
 	async def write(self, key_dict, body=None):
 		"""
@@ -1,3 +1,4 @@
+import functools
 import logging
 import re
 import types
@@ -5,10 +6,87 @@ from enum import Enum
 
 from metatools.version import generic
 
+try:
+    # RE2 (google-re2) guarantees linear-time matching, so user-supplied regexes can't backtrack pathologically
+    # when applied to hundreds of tags. It is optional.
+    import re2
+except ImportError:
+    re2 = None
+
 
 log = logging.getLogger('metatools.autogen')
 
 
+def compile_pattern(regex):
+    """
+    Compile regex string ``regex`` using RE2 if it is available, falling back to the standard ``re`` module if RE2
+    is not installed or does not support the pattern (RE2 does not support backreferences or lookarounds, for
+    example.) Already-compiled patterns are returned as-is.
+    """
+    if re2 is not None and isinstance(regex, str):
+        try:
+            return re2.compile(regex)
+        except re2.error:
+            pass
+    return re.compile(regex)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_regex(regex):
+    """
+    Compile ``regex`` (a regex string, or an already-compiled pattern) and cache the result. ``select`` and
+    ``filter`` regexes are applied to every tag or release we look at, so this avoids looking them up in the
+    ``re`` module's own (size-limited) cache each time.
+    """
+    return compile_pattern(regex)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_filter(filters: tuple):
+    """
+    Combine a tuple of ``filter`` regexes into a single compiled alternation, so that each tag or release is
+    matched against one pattern rather than once per filter. Patterns with groups can't be safely combined
+    (backreferences would be renumbered), nor can those using global inline flags like ``(?i)``, so in these
+    cases we fall back to using each compiled filter separately.
+
+    Returns a list of compiled patterns.
+    """
+    filter_res = [compile_regex(each_filter) for each_filter in filters]
+    if len(filter_res) > 1 and all(filter_re.groups == 0 for filter_re in filter_res):
+        try:
+            return [compile_pattern("|".join(f"(?:{filter_re.pattern})" for filter_re in filter_res))]
+        except re.error:
+            pass
+    return filter_res
+
+
+@functools.lru_cache(maxsize=4096)
+def sortable_version(version):
+    """
+    Return a sortable ``Version`` for the version string ``version``. Versions get sorted (and compared) many times
+    while looking for the latest release or tag, and parsing is comparatively expensive, so results are cached.
+    Returned objects are immutable, so it is safe to share them.
+    """
+    # NOTE: Version must be valid for packaging version (24.x) to avoid
+    #       exceptions. So for packages like openssh I replace
+    #       postfix to manage it as build suffix after '+' char.
+
+    # This is also possible... OMG... tag with version .1.3.2
+    if version.startswith("."):
+        version = version[1:len(version)]
+    if "_p" in version:
+        version = version.replace("_p", "+p")
+
+    # Yeah, it's true there are packages with
+    # mad versions
+    if "--" in version:
+        version = version.replace("--", "+")
+    if "-" in version:
+        version = version.replace("-", "+")
+
+    return generic.parse(version)
+
+
 class SortMethod(Enum):
     DATE = "DATE"
     VERSION = "VERSION"
@@ -24,6 +102,11 @@ class VersionMatch(Enum):
     Note that this regex is *not* anchored at all, so it can appear *anywhere* in the string. Because
     ``RegexMatcher`` uses re.search(), it will grab the first occurrence in the string, wherever it
     appears.
+
+    This does not need anchoring to avoid backtracking: the search can only fail to match at positions
+    that aren't a digit or '.', which it rejects immediately, and the first position that *is* a digit
+    or '.' always matches. So matching is linear in the length of the tag. Prefixing it with something
+    like ``(?:^|[^0-9])`` would not change which version is found, but would add work at every position.
     """
     GRABBY = r'([\d.]+(?:_p\d+)?(?:-r\d+)?)'
 
@@ -98,16 +181,16 @@ class RegexMatcher(Matcher):
                 self.regex = self.get_default_regex()
         else:
             if isinstance(regex, Enum):
-                self.regex = re.compile(regex.value)
+                self.regex = compile_regex(regex.value)
             elif isinstance(regex, re.Pattern):
-                pass
+                self.regex = regex
             elif isinstance(regex, str):
-                self.regex = re.compile(regex)
+                self.regex = compile_regex(regex)
             else:
                 raise ValueError(f"Unrecognized regex type: {type(regex)}")
 
     def get_default_regex(self):
-        return re.compile(VersionMatch.GRABBY.value)
+        return compile_regex(VersionMatch.GRABBY.value)
 
     def match(self, input: str, select=None, filter=None, transform=None):
         retval = self._match(input=input, select=select, filter=filter, transform=transform)
@@ -119,52 +202,36 @@ class RegexMatcher(Matcher):
 
         if transform:
             input = transform(input)
-        if select and not re.match(select, input):
+        if select and not compile_regex(select).match(input):
             return None
         if filter:
             if isinstance(filter, str):
-                if re.match(filter, input):
-                    return None
+                filter = (filter,)
             elif isinstance(filter, list):
-                for each_filter in filter:
-                    if re.match(each_filter, input):
-                        return None
+                filter = tuple(filter)
+            else:
+                filter = ()
+            if filter and any(filter_re.match(input) for filter_re in compile_filter(filter)):
+                return None
         match = self.regex.search(input)
         if match:
             return match.groups()[0]
 
     def sortable(self, version):
-        # NOTE: Version must be valid for packaging version (24.x) to avoid
-        #       exceptions. So for packages like openssh I replace
-        #       postfix to manage it as build suffix after '+' char.
-
-        # This is also possible... OMG... tag with version .1.3.2
-        if version.startswith("."):
-            version = version[1:len(version)]
-        if "_p" in version:
-            version = version.replace("_p", "+p")
-
-        # Yeah, it's true there are packages with
-        # mad versions
-        if "--" in version:
-            version = version.replace("--", "+")
-        if "-" in version:
-            version = version.replace("-", "+")
-
-        return generic.parse(version)
+        return sortable_version(version)
 
 
 class TagRegexMatcher(RegexMatcher):
 
     def get_default_regex(self):
         if self.filter or self.select:
-            return re.compile(TagVersionMatch.GRABBY.value)
+            return compile_regex(TagVersionMatch.GRABBY.value)
         else:
-            return re.compile(TagVersionMatch.STANDARD.value)
+            return compile_regex(TagVersionMatch.STANDARD.value)
 
 
 class ReleaseRegexMatcher(RegexMatcher):
-    regex = re.compile(ReleaseVersionMatch.STANDARD.value)
+    regex = compile_regex(ReleaseVersionMatch.STANDARD.value)
 
 
 async def iter_tag_versions(tags_list, select=None, filter=None, matcher=None, transform=None, version=None):
@@ -17,7 +17,7 @@ from subpop.util import AttrDict
 import metatools.steps
 from metatools.release import SourcedKit, AutoGeneratedKit
 from metatools.hashutils import get_md5
-from metatools.metadata import AUXDB_LINES, get_catpkg_relations_from_depstring, get_filedata, extract_ebuild_metadata, strip_rev
+from metatools.metadata import AUXDB_LINES, DEPSTRING_OPERATORS, get_catpkg_relations_from_depstring, get_filedata, extract_ebuild_metadata, strip_rev
 from metatools.model import get_model
 from metatools.tree import GitTreeError, Tree
 from metatools.cmd import run_shell
@@ -25,6 +25,9 @@ from metatools.zmq.app_core import RouterListener
 
 model = get_model("metatools")
 
+# How many metadata progress markers to accumulate before writing them out to the terminal in one go:
+PROGRESS_EVERY = 16
+
 
 class EclassHashCollection:
 	"""
@@ -71,13 +74,12 @@ class EclassHashCollection:
 	def scan_path(self, eclass_scan_path):
 		scan_count = 0
 		if os.path.isdir(eclass_scan_path):
-			for eclass in os.listdir(eclass_scan_path):
-				if not eclass.endswith(".eclass"):
-					continue
-				eclass_path = os.path.join(eclass_scan_path, eclass)
-				eclass_name = eclass[:-7]
-				self.hashes[eclass_name] = get_md5(eclass_path)
-				scan_count += 1
+			with os.scandir(eclass_scan_path) as entries:
+				for entry in entries:
+					if not entry.name.endswith(".eclass"):
+						continue
+					self.hashes[entry.name[:-7]] = get_md5(entry.path)
+					scan_count += 1
 		model.log.debug(f"EclassHashCollection: Found {scan_count} eclasses in path {eclass_scan_path}.")
 
 
@@ -105,6 +107,7 @@ class KitGenerator:
 	active_repos = set()
 
 	kit_cache = None
+	manifest_md5s = None
 
 	eclasses = None
 	merged_eclasses = None
@@ -216,8 +219,25 @@ class KitGenerator:
 		elif "LICENSE" not in infos:
 			return set()
 		else:
-			prelim = set(infos["LICENSE"].split()) - {'||', ')', '('}
-			return {i for i in prelim if not i.endswith('?')}
+			# Build the set in a single pass, skipping LICENSE syntax tokens and USE conditionals:
+			return {i for i in infos["LICENSE"].split() if i not in DEPSTRING_OPERATORS and not i.endswith('?')}
+
+	def get_manifest_md5(self, manifest_path):
+		"""
+		Return the md5 of a catpkg's Manifest, or None if it has none. All the ebuilds in a catpkg share one Manifest, so
+		we only hash each Manifest once per ``gen_cache()`` run. (Our worker threads may occasionally both hash the same
+		Manifest, which is harmless.)
+		"""
+		try:
+			return self.manifest_md5s[manifest_path]
+		except KeyError:
+			pass
+		try:
+			manifest_md5 = get_md5(manifest_path)
+		except FileNotFoundError:
+			manifest_md5 = None
+		self.manifest_md5s[manifest_path] = manifest_md5
+		return manifest_md5
 
 	def get_ebuild_metadata(self, merged_eclasses, ebuild_path) -> set:
 		"""
@@ -236,13 +256,7 @@ class KitGenerator:
 		cp_dir = ebuild_path[: ebuild_path.rfind("/")]
 		manifest_path = cp_dir + "/Manifest"
 
-		if not os.path.exists(manifest_path):
-			manifest_md5 = None
-		else:
-			# TODO: this is a potential area of performance improvement. Multiple ebuilds in a single catpkg
-			#		directory will result in get_md5() being called on the same Manifest file multiple times
-			#		during a run. Cache might be good here.
-			manifest_md5 = get_md5(manifest_path)
+		manifest_md5 = self.get_manifest_md5(manifest_path)
 
 		# Try to see if we already have this metadata in our kit metadata cache.
 		existing = self.kit_cache.get_atom(atom, ebuild_md5, manifest_md5, merged_eclasses)
@@ -325,34 +339,40 @@ class KitGenerator:
 		"""
 		Generate md5-cache metadata from a bunch of ebuilds, for this kit. Use a ThreadPoolExecutor to run as many threads
 		of this as we have logical cores on the system.
+
+		Threads (rather than processes) are the right fit here: the bulk of the work for each ebuild is done by the
+		``ebuild.sh`` bash subprocess that extracts its metadata, and threads waiting on a subprocess do not hold the
+		GIL, so we still keep all cores busy. A process pool would also need to pickle ``self`` and would not be able
+		to update our shared kit cache.
 		"""
 
 		total_count_lock = threading.Lock()
 		total_count = 0
 		all_licenses = set()
+		self.manifest_md5s = {}
 
 		with ThreadPoolExecutor(max_workers=cpu_count()) as executor:
 			count = 0
-			futures = []
-			fut_map = {}
-
-			for ebpath in self.iter_ebuilds():
-				future = executor.submit(
-					self.get_ebuild_metadata,
-					self.merged_eclasses,
-					ebpath
-				)
-				fut_map[future] = ebpath
-				futures.append(future)
+			futures = [
+				executor.submit(self.get_ebuild_metadata, self.merged_eclasses, ebpath)
+				for ebpath in self.iter_ebuilds()
+			]
 
+			progress = []
 			for future in as_completed(futures):
 				count += 1
 				data = future.result()
 				if data is None:
-					sys.stdout.write("!")
+					progress.append("!")
 				else:
 					all_licenses |= data
-					sys.stdout.write(".")
+					progress.append(".")
+				if len(progress) >= PROGRESS_EVERY:
+					sys.stdout.write("".join(progress))
+					sys.stdout.flush()
+					progress.clear()
+			if progress:
+				sys.stdout.write("".join(progress))
 				sys.stdout.flush()
 
 			with total_count_lock:
@@ -417,12 +437,10 @@ class KitGenerator:
 		await self.run(self.autogen_and_copy_from_kit_fixups())
 
 	async def copy_licenses(self, used_licenses=None):
-		needed_licenses = set()
 		os.makedirs(f"{self.out_tree.root}/licenses", exist_ok=True)
 
-		for license in used_licenses:
-			if not os.path.exists(f"{self.out_tree.root}/licenses/{license}"):
-				needed_licenses.add(license)
+		# List the licenses we already have once, rather than stat()ing for each license we use:
+		needed_licenses = set(used_licenses) - set(os.listdir(f"{self.out_tree.root}/licenses"))
 
 		for license in needed_licenses:
 			found = self.kit.source.find_license(license)
@@ -896,24 +914,29 @@ class MetaRepoJobController:
 			f"cd {base_path}/{repo.name}.pushme && git remote add upstream {mirror} && git push --mirror upstream",
 			logger=model.log
 		)
-		await run_shell(f"rm -rf {base_path}/{repo.name}.pushme", logger=model.log)
+		await run_shell(["rm", "-rf", f"{base_path}/{repo.name}.pushme"], logger=model.log)
 		return repo.name
 
-	# TODO: this can easily be made faster with gather:
 	async def mirror_all_repositories(self):
+		"""
+		Mirror all kits, and meta-repo, to their mirror locations. Different repositories are mirrored concurrently.
+		Mirrors for repositories with the same name are pushed one after another, because ``mirror_repository()``
+		uses a temporary clone path based on the repository name.
+		"""
 		base_path = os.path.join(model.temp_path, "mirror_repos")
 		await run_shell(f"rm -rf {base_path}", logger=model.log)
-		kit_mirror_futures = []
+		mirror_jobs = defaultdict(list)
 		for kit_job in self.kit_jobs:
-			if not kit_job.out_tree.mirrors:
-				continue
-			kit = kit_job.kit
-			for mirror in kit_job.out_tree.mirrors:
-				mirror = mirror.format(repo=kit_job.kit.name)
-				await self.mirror_repository(kit_job.out_tree, base_path, mirror)
+			for mirror in kit_job.out_tree.mirrors or []:
+				mirror_jobs[kit_job.out_tree.name].append((kit_job.out_tree, mirror.format(repo=kit_job.kit.name)))
 		for mirror in self.meta_repo.mirrors:
-			mirror = mirror.format(repo=self.meta_repo.name)
-			await self.mirror_repository(self.meta_repo, base_path, mirror)
+			mirror_jobs[self.meta_repo.name].append((self.meta_repo, mirror.format(repo=self.meta_repo.name)))
+
+		async def mirror_in_sequence(jobs):
+			for repo, mirror in jobs:
+				await self.mirror_repository(repo, base_path, mirror)
+
+		await asyncio.gather(*(mirror_in_sequence(jobs) for jobs in mirror_jobs.values()))
 		model.log.info("Mirroring of meta-repo complete.")
 
 
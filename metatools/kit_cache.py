@@ -7,6 +7,12 @@ import json
 
 from metatools.model import get_model
 
+try:
+	# Kit caches can be quite large, and orjson is much faster at loading and saving them. It reads and writes bytes.
+	import orjson
+except ImportError:
+	orjson = None
+
 CACHE_DATA_VERSION = "1.0.6"
 
 model = get_model("metatools")
@@ -45,9 +51,9 @@ class KitCache:
 		it and look at it. It will check to make sure the CACHE_DATA_VERSION matches what this code is designed to
 		inspect, by default.
 		"""
-		with open(self.path, "r") as f:
+		with open(self.path, "rb") as f:
 			try:
-				kit_cache_data = json.loads(f.read())
+				kit_cache_data = orjson.loads(f.read()) if orjson else json.loads(f.read())
 			except json.decoder.JSONDecodeError as jde:
 				model.log.error(f"Unable to parse JSON in {self.path}: {jde}")
 				raise jde
@@ -152,8 +158,12 @@ class KitCache:
 			log_out = model.log.debug
 		log_out(f"Flushed {self.name}. {len(self.json_data['atoms'])} atoms. Removed {len(remove_keys)} keys. {len(self.metadata_errors)} errors.")
 		os.makedirs(os.path.dirname(self.path), exist_ok=True)
-		with open(self.path, "w") as f:
-			f.write(json.dumps(outdata))
+		if orjson:
+			with open(self.path, "wb") as f:
+				f.write(orjson.dumps(outdata, option=orjson.OPT_NON_STR_KEYS))
+		else:
+			with open(self.path, "w") as f:
+				f.write(json.dumps(outdata))
 		error_outpath = os.path.join(
 			model.temp_path, f"metadata-errors-{self.name}-{self.branch}.log"
 		)
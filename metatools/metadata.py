@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import functools
 import glob
 import logging
 import os
@@ -123,8 +124,9 @@ def get_eapi_of_ebuild(ebuild_path):
 
 		return (eapi, eapi_lineno)
 
+	# Iterate over the file directly -- we stop at the first non-comment line, so there's no need to read it all:
 	with open(ebuild_path, "r") as fobj:
-		return _parse_eapi_ebuild_head(fobj.readlines())
+		return _parse_eapi_ebuild_head(fobj)
 
 
 def extract_manifest_hashes(man_file):
@@ -133,25 +135,28 @@ def extract_manifest_hashes(man_file):
 	DIST entry, and return this info along with filesize in a dict.
 	"""
 	man_info = {}
-	if os.path.exists(man_file):
-		with open(man_file, "r") as man_f:
-			for line in man_f.readlines():
-				ls = line.split()
-				if len(ls) <= 3 or ls[0] != "DIST":
-					continue
-				pos = 3
-				digests = {}
-				while pos < len(ls):
-					hash_type = ls[pos].lower()
-					if pos + 2 > len(ls):
-						raise ValueError(f'Invalid Manifest file format: {man_file}')
-					hash_digest = ls[pos + 1]
-					digests[hash_type] = hash_digest
-					pos += 2
-				man_info[ls[1]] = {"size": ls[2], "hashes": digests}
+	try:
+		man_f = open(man_file, "r")
+	except FileNotFoundError:
+		return man_info
+	with man_f:
+		# Stream the Manifest rather than reading all its lines into memory first:
+		for line in man_f:
+			ls = line.split()
+			if len(ls) <= 3 or ls[0] != "DIST":
+				continue
+			# After "DIST filename size", the line consists of hash type and digest pairs:
+			if (len(ls) - 3) % 2:
+				raise ValueError(f'Invalid Manifest file format: {man_file}')
+			digests = {hash_type.lower(): hash_digest for hash_type, hash_digest in zip(ls[3::2], ls[4::2])}
+			man_info[ls[1]] = {"size": ls[2], "hashes": digests}
 	return man_info
 
 
+# Grouping and any-of tokens that appear in SRC_URI, LICENSE and dependency strings, rather than actual values:
+DEPSTRING_OPERATORS = frozenset(("(", ")", "||"))
+
+
 def extract_uris(src_uri):
 	"""
 	This function will take a SRC_URI value from an ebuild, and it will return a dictionary in the following format:
@@ -163,8 +168,14 @@ def extract_uris(src_uri):
 	Note that in the code below, a "blob" is simply a piece of parsed SRC_URI information that *may* be a URL.
 	"""
 	fn_urls = {}
+	# The same URL can appear more than once for a file (e.g. in different USE-conditional groups). Track the URLs we've
+	# recorded for each file in a set, so we only record each once without scanning the list:
+	seen_urls = defaultdict(set)
 
 	def record_fn_url(my_fn, p_blob):
+		if p_blob in seen_urls[my_fn]:
+			return
+		seen_urls[my_fn].add(p_blob)
 		if my_fn not in fn_urls:
 			fn_urls[my_fn] = {"src_uri": [p_blob]}
 		else:
@@ -179,7 +190,7 @@ def extract_uris(src_uri):
 			blob = blobs[pos]
 		else:
 			blob = ""
-		if blob in [")", "(", "||"] or blob.endswith("?"):
+		if blob in DEPSTRING_OPERATORS or blob.endswith("?"):
 			pos += 1
 			continue
 		if blob == "->":
@@ -220,7 +231,7 @@ def get_catpkg_relations_from_depstring(depstring):
 	for part in depstring.split():
 
 		# 1. Strip out things we are not interested in:
-		if part in ["(", ")", "||"]:
+		if part in DEPSTRING_OPERATORS:
 			continue
 		if part.endswith("?"):
 			continue
@@ -267,27 +278,49 @@ def get_catpkg_relations_from_depstring(depstring):
 	return catpkgs
 
 
+# Environment settings for ebuild.sh that are the same for every ebuild:
+EBUILD_SH_ENV = {
+	"PATH": "/bin:/usr/bin",
+	"LC_COLLATE": "POSIX",
+	"LANG": "en_US.UTF-8",
+	"PORTAGE_GID": "250",
+	"EBUILD_PHASE": "depend",
+	# Normally keep this turned off:
+	# "ECLASS_DEBUG_OUTPUT": "on",
+	# This tells ebuild.sh to write out the metadata to stdout (fd 1) which is where we will grab
+	# it from:
+	"PORTAGE_PIPE_FD": "1",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_portage_bin_path():
+	"""
+	Find Portage's bin directory (containing ebuild.sh). This doesn't change during a run, so only glob for it once.
+	"""
+	return glob.glob("/usr/lib/portage/python3*")[-1]
+
+
+@functools.lru_cache(maxsize=64)
+def get_eclass_locations(eclass_paths: tuple):
+	"""
+	Return the PORTAGE_ECLASS_LOCATIONS setting for ``eclass_paths``, which is the same for every ebuild in a kit.
+	"""
+	return " ".join(quote(x) for x in eclass_paths)
+
+
 def extract_ebuild_metadata(kit_gen_obj, atom, ebuild_path=None, env=None, eclass_paths=None):
 	infos = {"HASH_KEY": atom}
-	env["PATH"] = "/bin:/usr/bin"
-	env["LC_COLLATE"] = "POSIX"
-	env["LANG"] = "en_US.UTF-8"
+	env.update(EBUILD_SH_ENV)
 	# For things to work correctly, the EAPI of the ebuild has to be manually extracted:
 	eapi, lineno = get_eapi_of_ebuild(ebuild_path)
 	if eapi is not None and eapi in "012345678":
 		env["EAPI"] = eapi
 	else:
 		env["EAPI"] = "0"
-	env["PORTAGE_GID"] = "250"
-	env["PORTAGE_BIN_PATH"] = glob.glob("/usr/lib/portage/python3*")[-1]
+	env["PORTAGE_BIN_PATH"] = get_portage_bin_path()
 	env["EBUILD"] = ebuild_path
-	env["EBUILD_PHASE"] = "depend"
-	# Normally keep this turned off:
-	# env["ECLASS_DEBUG_OUTPUT"] = "on"
-	# This tells ebuild.sh to write out the metadata to stdout (fd 1) which is where we will grab
-	# it from:
-	env["PORTAGE_PIPE_FD"] = "1"
-	env["PORTAGE_ECLASS_LOCATIONS"] = " ".join(quote(x) for x in eclass_paths)
+	env["PORTAGE_ECLASS_LOCATIONS"] = get_eclass_locations(tuple(eclass_paths))
 	ebuild_sh_path = os.path.join(env["PORTAGE_BIN_PATH"], "ebuild.sh")
 	cmdstr = f". {ebuild_sh_path}\n"
 	with subprocess.Popen(["/bin/bash", "-c", cmdstr], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
@@ -348,15 +381,13 @@ def get_filedata(src_uri, manifest_path):
 	"""
 
 	filedata = extract_manifest_hashes(manifest_path)
-	extracted_uris = extract_uris(src_uri)
-
-	for fn, sub_dict in extracted_uris.items():
-		# just augment SRC_URI data with Manifest data, if available.
-		if fn in filedata:
-			extracted_uris[fn].update(filedata[fn])
 
 	outdata = []
-	for fn, datums in extracted_uris.items():
+	for fn, datums in extract_uris(src_uri).items():
+		# just augment SRC_URI data with Manifest data, if available.
+		hashes = filedata.get(fn)
+		if hashes is not None:
+			datums.update(hashes)
 		datums["name"] = fn
 		outdata.append(datums)
 
@@ -387,11 +418,25 @@ def catpkg_generator(repo_path=None):
 						yield os.path.join(pkgpath)
 
 
-async def get_python_use_lines(kit_gen, catpkg, cpv_list, cur_tree, def_python, bk_python):
+# PYTHON_COMPAT "+" shorthands, and the implementations python-utils-r1.eclass expands them to:
+PYTHON_COMPAT_EXPANSIONS = {
+	"python3+": ("python3_7", "python3_8", "python3_9", "python3_10"),
+	"python3_7+": ("python3_7", "python3_8", "python3_9", "python3_10"),
+	"python3.8+": ("python3_8", "python3_9", "python3_10"),
+	"python3.9+": ("python3_9", "python3_10"),
+	"python3.10+": ("python3_10",),
+	"python2+": ("python2_7", "python3_7", "python3_8", "python3_9", "python3_10"),
+}
+
+
+def get_python_use_lines(kit_gen, catpkg, cpv_list, cur_tree, def_python, bk_python):
 	# Shall not be None:
 	assert def_python
 	# TODO: This should be fixed or replaced, because there's hard-coded thangs in here.
 	#       Best solution would be to move it to the release metadata.
+	# The eclass bumps python3_5 and python3_6 to python3_7. We do the same (to our primary implementation) to get
+	# correct results. Merge this into our expansion table once, so each implementation needs just one lookup:
+	expansions = dict(PYTHON_COMPAT_EXPANSIONS, python3_5=(def_python,), python3_6=(def_python,))
 	ebs = {}
 	for cpv in cpv_list:
 		if "metadata" not in kit_gen.kit_cache[cpv]:
@@ -410,22 +455,10 @@ async def get_python_use_lines(kit_gen, catpkg, cpv_list, cur_tree, def_python,
 
 		new_imps = set()
 		for imp in imps:
-			if imp in ["python3_5", "python3_6"]:
-				# The eclass bumps these to python3_7. We do the same to get correct results:
-				new_imps.add(def_python)
-			elif imp in ["python3+", "python3_7+"]:
-				new_imps.update(["python3_7", "python3_8", "python3_9", "python3_10"])
-			elif imp == "python3.8+":
-				new_imps.update(["python3_8", "python3_9", "python3_10"])
-			elif imp == "python3.9+":
-				new_imps.update(["python3_9", "python3_10"])
-			elif imp == "python3.10+":
-				new_imps.add("python3_10")
-			elif imp == "python2+":
-				new_imps.update(["python2_7", "python3_7", "python3_8", "python3_9", "python3_10"])
-			else:
-				new_imps.add(imp)
-		imps = list(new_imps)
+			new_imps.update(expansions.get(imp, (imp,)))
+		# Sort, so that we can compare the implementations of different ebuilds below -- set iteration order can
+		# differ even for equal sets, which would otherwise cause spurious per-version (split) lines:
+		imps = sorted(new_imps)
 		if len(imps):
 			ebs[cpv] = imps
 
@@ -433,18 +466,12 @@ async def get_python_use_lines(kit_gen, catpkg, cpv_list, cur_tree, def_python,
 	# if split == False, then we will do one global setting for the catpkg. If split == True, we will do individual settings for each version
 	# of the catpkg, since there are differences. This saves space in our python-use file while keeping everything correct.
 
-	all_imps = None
-	split = False
-	for key, imps in ebs.items():
-		if all_imps is None:
-			all_imps = imps
-		else:
-			if all_imps != imps:
-				split = True
-				break
+	variants = {tuple(imps) for imps in ebs.values()}
+	split = len(variants) > 1
 	lines = []
-	if len(ebs.keys()):
+	if variants:
 		if not split:
+			all_imps = list(next(iter(variants)))
 			logging.debug(f"package.use line: {catpkg}: def/bk: {def_python} {bk_python} imps: {all_imps} (NOT SPLIT)")
 			line = do_package_use_line(catpkg, def_python, bk_python, all_imps)
 			if line is not None:
@@ -4,12 +4,11 @@ from collections import OrderedDict, defaultdict
 from datetime import datetime
 from enum import Enum
 
-import yaml
 from metatools.model import get_model
 
 from metatools.context import GitRepositoryLocator
 from metatools.tree import GitTree
-from metatools.yaml_util import YAMLReader
+from metatools.yaml_util import YAMLReader, safe_load
 from subpop.config import ConfigurationError
 
 log = logging.getLogger("metatools")
@@ -283,7 +282,7 @@ class AutoGeneratedKit(Kit):
 
 	def _get_package_data(self):
 		with open(self.packages_yaml, "r") as f:
-			return yaml.safe_load(f)
+			return safe_load(f)
 
 	def yaml_walk(self, yaml_dict):
 		"""
@@ -566,8 +565,14 @@ class ReleaseYAML(YAMLReader):
 		If 'name' is specified, then only yield those kits with matching name.
 		If 'primary' is True, then yield only primary kits (first kit in YAML).
 		"""
-		for kit_name, kit_list in self.kits.items():
-			if name is not None and kit_name != name:
+		if name is not None:
+			# self.kits is indexed by kit name, so look the kit up directly rather than scanning all kits. Use .get()
+			# so we don't add an empty entry to the defaultdict for an unknown kit:
+			kit_lists = [self.kits.get(name, [])]
+		else:
+			kit_lists = self.kits.values()
+		for kit_list in kit_lists:
+			if not kit_list:
 				continue
 			if primary:
 				yield kit_list[0]
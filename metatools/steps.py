@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import asyncio
 import itertools
 import os
 import re
@@ -12,11 +13,31 @@ import metatools.tree
 from metatools.model import get_model
 model = get_model("metatools")
 
+# metadata/layout.conf written for every generated kit by GenerateRepoMetadata:
+LAYOUT_CONF_TEMPLATE = """repo-name = %s
+thin-manifests = true
+sign-manifests = false
+profile-formats = portage-2
+cache-formats = md5-dict
+"""
+
 
 def run_shell(cmd_list, abort_on_failure=True, chdir=None):
 	return metatools.cmd.run_shell(cmd_list, abort_on_failure=abort_on_failure, chdir=chdir, logger=model.log)
 
 
+def read_categories(cat_path):
+	"""
+	Return the categories listed in the ``profiles/categories`` file at ``cat_path`` as a frozenset, or an empty
+	frozenset if the file does not exist.
+	"""
+	try:
+		with open(cat_path, "r") as f:
+			return frozenset(f.read().split())
+	except FileNotFoundError:
+		return frozenset()
+
+
 class MergeStep:
 
 	# This is only used for Repository Steps:
@@ -53,20 +74,21 @@ class ThirdPartyMirrors(MergeStep):
 			"https://distfiles.macaronios.org"
 		)
 		mirrors = METATOOLS_DISTFILES_HOST
-		a = open(orig, "r")
-		b = open(new, "w")
-		for line in a:
-			ls = line.split()
-			if len(ls) and ls[0] == "gentoo":
-				b.write("gentoo\t" + mirrors + " " + " ".join(ls[1:]) + "\n")
-			else:
-				b.write(line)
-		b.write("funtoo %s\n" % mirrors)
-		a.close()
-		b.close()
-		os.unlink(orig)
-		os.link(new, orig)
-		os.unlink(new)
+		out = []
+		with open(orig, "r") as a:
+			for line in a:
+				# Only split lines that could possibly be the gentoo entry:
+				if "gentoo" in line:
+					ls = line.split()
+					if len(ls) and ls[0] == "gentoo":
+						out.append("gentoo\t" + mirrors + " " + " ".join(ls[1:]) + "\n")
+						continue
+				out.append(line)
+		out.append("funtoo %s\n" % mirrors)
+		with open(new, "w") as b:
+			b.write("".join(out))
+		# atomically replace the original, so it never goes missing:
+		os.replace(new, orig)
 
 
 class SyncDir(MergeStep):
@@ -122,30 +144,18 @@ class GenerateRepoMetadata(MergeStep):
 
 	async def run(self, kit_gen):
 		meta_path = os.path.join(kit_gen.out_tree.root, "metadata")
-		if not os.path.exists(meta_path):
-			os.makedirs(meta_path)
-		a = open(meta_path + "/layout.conf", "w")
-		out = (
-			"""repo-name = %s
-thin-manifests = true
-sign-manifests = false
-profile-formats = portage-2
-cache-formats = md5-dict
-"""
-			% self.name
-		)
+		os.makedirs(meta_path, exist_ok=True)
+		out = LAYOUT_CONF_TEMPLATE % self.name
 		if self.aliases:
 			out += "aliases = %s\n" % " ".join(self.aliases)
 		if self.masters:
 			out += "masters = %s\n" % " ".join(self.masters)
-		a.write(out)
-		a.close()
+		with open(meta_path + "/layout.conf", "w") as a:
+			a.write(out)
 		rn_path = os.path.join(kit_gen.out_tree.root, "profiles")
-		if not os.path.exists(rn_path):
-			os.makedirs(rn_path)
-		a = open(rn_path + "/repo_name", "w")
-		a.write(self.name + "\n")
-		a.close()
+		os.makedirs(rn_path, exist_ok=True)
+		with open(rn_path + "/repo_name", "w") as a:
+			a.write(self.name + "\n")
 
 
 class RemoveIfExists(MergeStep):
@@ -205,17 +215,20 @@ class CopyFiles(MergeStep):
 		self.file_map_tuples = file_map_tuples
 
 	async def run(self, kit_gen):
+		# The roots are fixed for the whole loop, so build the prefixes once rather than calling os.path.join() per file:
+		src_base = f"{self.srctree.root}/"
+		dst_base = f"{kit_gen.out_tree.root}/"
 		for src_path, dst_path in self.file_map_tuples:
-			f_src_path = os.path.join(self.srctree.root, src_path)
+			f_src_path = src_base + src_path
 			if not os.path.exists(f_src_path):
 				raise FileNotFoundError(f"Source file not found: {f_src_path}.")
-			f_dst_path = os.path.join(kit_gen.out_tree.root, dst_path)
+			f_dst_path = dst_base + dst_path
 			if os.path.exists(f_dst_path):
 				os.unlink(f_dst_path)
-			parent = os.path.dirname(f_dst_path)
-			if not os.path.exists(parent):
-				os.makedirs(parent, exist_ok=True)
-			await run_shell(f"cp -a {f_src_path} {f_dst_path}")
+			os.makedirs(os.path.dirname(f_dst_path), exist_ok=True)
+			# copy2() preserves mode and timestamps like "cp -a" does, and lets the kernel copy the data (sendfile) without
+			# forking a shell and cp for every file:
+			shutil.copy2(f_src_path, f_dst_path, follow_symlinks=False)
 
 
 class CopyAndRename(MergeStep):
@@ -227,10 +240,9 @@ class CopyAndRename(MergeStep):
 
 	async def run(self, kit_gen):
 		srcpath = os.path.join(kit_gen.out_tree.root, self.src)
+		destpath = os.path.join(kit_gen.out_tree.root, self.dest)
 		for f in os.listdir(srcpath):
-			destfile = os.path.join(kit_gen.out_tree.root, self.dest)
-			destfile = os.path.join(destfile, self.ren_fun(f))
-			await run_shell(f"cp -a {srcpath}/{f} {destfile}")
+			await run_shell(f"cp -a {srcpath}/{f} {destpath}/{self.ren_fun(f)}")
 
 
 class SyncFiles(MergeStep):
@@ -272,14 +284,15 @@ class CleanTree(MergeStep):
 		self.exclude = exclude
 
 	async def run(self, kit_gen):
-		files = ""
+		files = []
 		for fn in os.listdir(kit_gen.out_tree.root):
 			if fn[:1] == ".":
 				continue
 			if fn in self.exclude:
 				continue
-			files += " '" + fn + "'"
-		await run_shell(f"cd {kit_gen.out_tree.root} && rm -rf {files[1:]}")
+			files.append(fn)
+		if files:
+			await run_shell(["rm", "-rf", "--"] + files, chdir=kit_gen.out_tree.root)
 
 
 class ELTSymlinkWorkaround(MergeStep):
@@ -291,6 +304,12 @@ class ELTSymlinkWorkaround(MergeStep):
 
 regextype = type(re.compile("hello, world"))
 
+# Maximum number of source paths passed to a single "cp -a" invocation:
+COPY_BATCH_SIZE = 256
+
+# Number of copy scripts InsertEbuilds runs in parallel:
+COPY_SCRIPT_JOBS = min(8, os.cpu_count() or 1)
+
 
 class InsertFilesFromSubdir(MergeStep):
 	def __init__(self, srctree, subdir, suffixfilter=None, select="all", skip=None, src_offset=""):
@@ -315,6 +334,7 @@ class InsertFilesFromSubdir(MergeStep):
 			dst = os.path.join(dst, self.subdir)
 		if not os.path.exists(dst):
 			os.makedirs(dst)
+		to_copy = []
 		for e in os.listdir(src):
 			if self.suffixfilter and not e.endswith(self.suffixfilter):
 				continue
@@ -330,7 +350,10 @@ class InsertFilesFromSubdir(MergeStep):
 			elif isinstance(self.skip, regextype):
 				if self.skip.match(e):
 					continue
-			await run_shell("cp -a %s/%s %s" % (src, e, dst))
+			to_copy.append(f"{src}/{e}")
+		# Copy the selected files with as few cp processes as possible rather than forking one per file:
+		for pos in range(0, len(to_copy), COPY_BATCH_SIZE):
+			await run_shell(["cp", "-a"] + to_copy[pos:pos + COPY_BATCH_SIZE] + [dst])
 
 
 class PruneLicenses(MergeStep):
@@ -347,7 +370,7 @@ class PruneLicenses(MergeStep):
 		for key, datums in kit_gen.kit_cache.items():
 			metadata = datums["metadata"]
 			if metadata and "LICENSE" in metadata:
-				used_licenses = used_licenses | set(metadata["LICENSE"].split())
+				used_licenses.update(metadata["LICENSE"].split())
 		return used_licenses
 
 	async def run(self, kit_gen):
@@ -364,12 +387,10 @@ class PruneLicenses(MergeStep):
 class CreateCategories(MergeStep):
 	async def run(self, kit_gen):
 		catset = set()
-		for maybe_cat in os.listdir(kit_gen.out_tree.root):
-			full_path = os.path.join(kit_gen.out_tree.root, maybe_cat)
-			if not os.path.isdir(full_path):
-				continue
-			if "-" in maybe_cat or maybe_cat == "virtual":
-				catset.add(maybe_cat)
+		with os.scandir(kit_gen.out_tree.root) as entries:
+			for entry in entries:
+				if ("-" in entry.name or entry.name == "virtual") and entry.is_dir():
+					catset.add(entry.name)
 		if not os.path.exists(kit_gen.out_tree.root + "/profiles"):
 			os.makedirs(kit_gen.out_tree.root + "/profiles")
 		with open(kit_gen.out_tree.root + "/profiles/categories", "w") as g:
@@ -388,12 +409,7 @@ class ZapMatchingEbuilds(MergeStep):
 			# Allow dynamic switching to different branches/commits to grab things we want:
 			self.srctree.git_checkout(branch=self.branch)
 		# Figure out what categories to process:
-		dest_cat_path = os.path.join(kit_gen.out_tree.root, "profiles/categories")
-		if os.path.exists(dest_cat_path):
-			with open(dest_cat_path, "r") as f:
-				dest_cat_set = set(f.read().splitlines())
-		else:
-			dest_cat_set = set()
+		dest_cat_set = read_categories(os.path.join(kit_gen.out_tree.root, "profiles/categories"))
 
 		# Our main loop:
 		print("# Zapping builds from %s" % kit_gen.out_tree.root)
@@ -403,12 +419,17 @@ class ZapMatchingEbuilds(MergeStep):
 			src_catdir = os.path.join(self.srctree.root, cat)
 			if not os.path.isdir(src_catdir):
 				continue
+			dest_catdir = os.path.join(kit_gen.out_tree.root, cat)
+			# List the destination category once, rather than stat()ing for each source package:
+			try:
+				dest_pkgs = set(os.listdir(dest_catdir))
+			except NotADirectoryError:
+				continue
 			for src_pkg in os.listdir(src_catdir):
-				dest_pkgdir = os.path.join(kit_gen.out_tree.root, cat, src_pkg)
-				if not os.path.exists(dest_pkgdir):
+				if src_pkg not in dest_pkgs:
 					# don't need to zap as it doesn't exist
 					continue
-				await run_shell("rm -rf %s" % dest_pkgdir)
+				await run_shell(["rm", "-rf", os.path.join(dest_catdir, src_pkg)])
 
 
 class Autogen(MergeStep):
@@ -480,14 +501,25 @@ class InsertEbuilds(MergeStep):
 		else:
 			self.select_only = select_only
 		self.ebuildloc = ebuildloc
+		# run() tests every source catpkg against these, so do the type dispatch once here and use sets for lookups:
+		self.select_only_set = None if self.select_only == "all" else frozenset(self.select_only)
+		self.select_set = frozenset(select) if isinstance(select, list) else None
+		self.select_re = select if isinstance(select, regextype) else None
+		self.skip_set = frozenset(skip) if isinstance(skip, list) else None
+		self.skip_re = skip if isinstance(skip, regextype) else None
+		self.replace_set = frozenset(replace) if isinstance(replace, list) else None
 
 	def __repr__(self):
 		return "<InsertEbuilds: %s>" % self.srctree.root
 
 	async def run(self, kit_gen):
 
-		script_out = ""
+		# Copy commands are sharded by destination directory so that the shards can run concurrently while commands for
+		# the same destination (an rm -rf followed by its cp -a) still run in order:
+		scripts_out = [""] * COPY_SCRIPT_JOBS
 		checks = []
+		# destination category directories we have already made sure exist:
+		created_catdirs = set()
 
 		if self.ebuildloc:
 			srctree_root = self.srctree.root + "/" + self.ebuildloc
@@ -496,29 +528,16 @@ class InsertEbuilds(MergeStep):
 
 		kit_gen.out_tree.log_tree(self.srctree)
 		# Figure out what categories to process:
-		src_cat_path = os.path.join(srctree_root, "profiles/categories")
-		dest_cat_path = os.path.join(kit_gen.out_tree.root, "profiles/categories")
 		if self.categories is not None:
 			# categories specified in __init__:
-			src_cat_set = set(self.categories)
-		else:
-			src_cat_set = set()
-			if os.path.exists(src_cat_path):
-				# categories defined in profile:
-				with open(src_cat_path, "r") as f:
-					src_cat_set.update(f.read().splitlines())
-			# auto-detect additional categories:
-			cats = os.listdir(srctree_root)
-			for cat in cats:
-				# All categories have a "-" in them and are directories:
-				if os.path.isdir(os.path.join(srctree_root, cat)):
-					if "-" in cat or cat == "virtual":
-						src_cat_set.add(cat)
-		if os.path.exists(dest_cat_path):
-			with open(dest_cat_path, "r") as f:
-				dest_cat_set = set(f.read().splitlines())
+			src_cat_set = frozenset(self.categories)
 		else:
-			dest_cat_set = set()
+			# categories defined in profile, plus auto-detected additional categories. All categories have a "-" in them
+			# (or are "virtual") and are directories:
+			with os.scandir(srctree_root) as entries:
+				src_cat_set = read_categories(os.path.join(srctree_root, "profiles/categories")) | {
+					entry.name for entry in entries if ("-" in entry.name or entry.name == "virtual") and entry.is_dir()
+				}
 		# Our main loop:
 		model.log.info(f"Merging in ebuilds from {srctree_root}")
 		for cat in src_cat_set:
@@ -527,32 +546,33 @@ class InsertEbuilds(MergeStep):
 				# not a valid category in source overlay, so skip it
 				continue
 			# runShell("install -d %s" % catdir)
-			for pkg in os.listdir(catdir):
-				catpkg = "%s/%s" % (cat, pkg)
-				pkgdir = os.path.join(catdir, pkg)
-				if self.select_only != "all" and catpkg not in self.select_only:
+			with os.scandir(catdir) as pkg_entries:
+				pkg_entries = list(pkg_entries)
+			for pkg_entry in pkg_entries:
+				catpkg = "%s/%s" % (cat, pkg_entry.name)
+				pkgdir = pkg_entry.path
+				if self.select_only_set is not None and catpkg not in self.select_only_set:
 					# we don't want this catpkg
 					continue
-				if not os.path.isdir(pkgdir):
+				if not pkg_entry.is_dir():
 					# not a valid package dir in source overlay, so skip it
 					continue
-				if isinstance(self.select, list):
-					if catpkg not in self.select:
+				if self.select_set is not None:
+					if catpkg not in self.select_set:
 						# we have a list of pkgs to merge, and this isn't on the list, so skip:
 						continue
-				elif isinstance(self.select, regextype):
-					if not self.select.match(catpkg):
+				elif self.select_re is not None:
+					if not self.select_re.match(catpkg):
 						# no regex match:
 						continue
-				if isinstance(self.skip, list):
-					if catpkg in self.skip:
+				if self.skip_set is not None:
+					if catpkg in self.skip_set:
 						# we have a list of pkgs to skip, and this catpkg is on the list, so skip:
 						continue
-				elif isinstance(self.skip, regextype):
-					if self.select.match(catpkg):
+				elif self.skip_re is not None:
+					if self.skip_re.match(catpkg):
 						# regex skip match, continue
 						continue
-				dest_cat_set.add(cat)
 				tpkgdir = None
 				tcatpkg = None
 				if catpkg in self.move_maps:
@@ -569,37 +589,40 @@ class InsertEbuilds(MergeStep):
 				else:
 					tpkgdir = os.path.join(kit_gen.out_tree.root, catpkg)
 				tcatdir = os.path.dirname(tpkgdir)
+				if tcatdir not in created_catdirs:
+					os.makedirs(tcatdir, exist_ok=True)
+					created_catdirs.add(tcatdir)
+				# stat the destination only once per package:
+				tpkg_exists = os.path.exists(tpkgdir)
 				copied = False
-				if self.replace is True or (isinstance(self.replace, list) and (catpkg in self.replace)):
-					if not os.path.exists(tcatdir):
-						os.makedirs(tcatdir)
-					if os.path.exists(tpkgdir):
-						script_out += f"/bin/rm -rf '{tpkgdir}' \n"
-					script_out += f"/bin/cp -a '{pkgdir}' '{tpkgdir}'\n"
+				shard = hash(tpkgdir) % COPY_SCRIPT_JOBS
+				if self.replace is True or (self.replace_set is not None and catpkg in self.replace_set):
+					if tpkg_exists:
+						scripts_out[shard] += f"/bin/rm -rf '{tpkgdir}' \n"
+					scripts_out[shard] += f"/bin/cp -a '{pkgdir}' '{tpkgdir}'\n"
 					checks.append(tpkgdir)
 					copied = True
-				else:
-					if not os.path.exists(tpkgdir):
-						copied = True
-					if not os.path.exists(tcatdir):
-						os.makedirs(tcatdir)
-					if not os.path.exists(tpkgdir):
-						script_out += f"/bin/cp -a '{pkgdir}' '{tpkgdir}'\n"
-						checks.append(tpkgdir)
+				elif not tpkg_exists:
+					copied = True
+					scripts_out[shard] += f"/bin/cp -a '{pkgdir}' '{tpkgdir}'\n"
+					checks.append(tpkgdir)
 				if copied:
 					# log XML here.
 					pass
-		if script_out:
-			temp_out = os.path.join(model.temp_path, kit_gen.out_tree.name + "_copyfiles.sh")
+		temp_outs = []
+		for shard, script_out in enumerate(scripts_out):
+			if not script_out:
+				continue
+			temp_out = os.path.join(model.temp_path, f"{kit_gen.out_tree.name}_copyfiles_{shard}.sh")
 			os.makedirs(os.path.dirname(temp_out), exist_ok=True)
-			#sys.stdout.write(f"Written to {temp_out}:\n")
-			#sys.stdout.write(script_out)
-			#sys.stdout.write("\n")
 			with open(temp_out, "w") as f:
 				f.write("#!/bin/bash\n")
 				f.write(script_out)
-			await run_shell(f"/bin/bash {temp_out}")
-			os.unlink(temp_out)
+			temp_outs.append(temp_out)
+		if temp_outs:
+			await asyncio.gather(*[run_shell(f"/bin/bash {temp_out}") for temp_out in temp_outs])
+			for temp_out in temp_outs:
+				os.unlink(temp_out)
 		for check in checks:
 			if not os.path.exists(check):
 				raise FileNotFoundError(
@@ -613,14 +636,17 @@ class ProfileDepFix(MergeStep):
 	async def run(self, kit_gen):
 		fpath = os.path.join(kit_gen.out_tree.root, "profiles/profiles.desc")
 		if os.path.exists(fpath):
-			a = open(fpath, "r")
-			for line in a:
-				if line[0:1] == "#":
-					continue
-				sp = line.split()
-				if len(sp) >= 2:
-					prof_path = sp[1]
-					await run_shell("rm -f %s/profiles/%s/deprecated" % (kit_gen.out_tree.root, prof_path))
+			with open(fpath, "r") as a:
+				for line in a:
+					if line[0:1] == "#":
+						continue
+					sp = line.split()
+					if len(sp) >= 2:
+						prof_path = sp[1]
+						try:
+							os.unlink("%s/profiles/%s/deprecated" % (kit_gen.out_tree.root, prof_path))
+						except FileNotFoundError:
+							pass
 
 
 class RunSed(MergeStep):
@@ -645,9 +671,31 @@ class RunSed(MergeStep):
 class Minify(MergeStep):
 	"""Minify removes ChangeLogs and shrinks Manifests."""
 
+	@staticmethod
+	def minify_tree(root):
+		for dirpath, dirnames, filenames in os.walk(root):
+			if ".git" in dirnames:
+				dirnames.remove(".git")
+			for fn in filenames:
+				lower_fn = fn.lower()
+				if lower_fn == "changelog":
+					try:
+						os.unlink(os.path.join(dirpath, fn))
+					except OSError:
+						pass
+				elif lower_fn == "manifest":
+					manifest_path = os.path.join(dirpath, fn)
+					with open(manifest_path, "rb") as f:
+						lines = f.readlines()
+					dist_lines = [line for line in lines if line.startswith(b"DIST")]
+					if len(dist_lines) != len(lines):
+						with open(manifest_path, "wb") as f:
+							f.writelines(dist_lines)
+
 	async def run(self, kit_gen):
-		await run_shell("( cd %s && find -iname ChangeLog | xargs rm -f )" % kit_gen.out_tree.root, abort_on_failure=False)
-		await run_shell("( cd %s && find -iname Manifest | xargs -i@ sed -ni '/^DIST/p' @ )" % kit_gen.out_tree.root)
+		# This walks the whole tree, removing ChangeLogs and keeping only DIST lines in Manifests, in-process rather
+		# than via find/xargs/sed. Do it in a thread so we don't block the event loop:
+		await asyncio.get_running_loop().run_in_executor(None, self.minify_tree, kit_gen.out_tree.root)
 
 
 class GenPythonUse(MergeStep):
@@ -665,19 +713,18 @@ class GenPythonUse(MergeStep):
 	async def run(self, kit_gen):
 		all_lines = []
 		for catpkg, cpv_list in metadata.get_catpkg_from_cpvs(kit_gen.kit_cache.keys()).items():
-			result = await metadata.get_python_use_lines(
+			result = metadata.get_python_use_lines(
 				kit_gen, catpkg, cpv_list, kit_gen.out_tree.root, self.def_python, self.bk_python
 			)
 			if result is not None:
 				all_lines += result
 
-		all_lines = sorted(all_lines)
+		all_lines.sort()
 		outpath = kit_gen.out_tree.root + "/profiles/" + self.out_subpath + "/package.use"
-		if not os.path.exists(outpath):
-			os.makedirs(outpath)
+		os.makedirs(outpath, exist_ok=True)
 		with open(outpath + "/python-use", "w") as f:
-			for l in all_lines:
-				f.write(l + "\n")
+			if all_lines:
+				f.write("\n".join(all_lines) + "\n")
 		# for core-kit, set good defaults as well.
 		if kit_gen.out_tree.name == "core-kit":
 			outpath = kit_gen.out_tree.root + "/profiles/" + self.out_subpath + "/make.defaults"
@@ -687,8 +734,7 @@ class GenPythonUse(MergeStep):
 			a.close()
 			if self.mask:
 				outpath = kit_gen.out_tree.root + "/profiles/" + self.out_subpath + "/package.mask/funtoo-kit-python"
-				if not os.path.exists(os.path.dirname(outpath)):
-					os.makedirs(os.path.dirname(outpath))
+				os.makedirs(os.path.dirname(outpath), exist_ok=True)
 				a = open(outpath, "w")
 				a.write(self.mask + "\n")
 				a.close()
@@ -1,6 +1,10 @@
+import errno
+import fcntl
 import hashlib
 import json
 import os
+import shutil
+import tempfile
 from collections import OrderedDict
 from typing import Mapping, Optional
 
@@ -33,10 +37,48 @@ JSON_OPTIONS = JSONOptions(
 			type_registry=TypeRegistry(type_codecs=[], fallback_encoder=None))
 
 
+# ioctl used to create a copy-on-write clone of a file (reflink) on filesystems that support it, like Btrfs and XFS:
+FICLONE = 0x40049409
+
+
 class NotFoundError(Exception):
 	pass
 
 
+def link_or_clone(src_path, dest_path):
+	"""
+	Populate ``dest_path`` with the contents of ``src_path`` without copying any data if we can help it. We hard-link
+	when possible, which is cheapest. If ``dest_path`` is on a different device (hard links can't cross even btrfs
+	subvolumes), we try to create a reflink (copy-on-write clone). That only works within a single filesystem, so
+	if it is not supported we fall back to actually copying the data.
+
+	A clone or copy is written to a temporary file next to ``dest_path`` and then renamed into place. This way
+	``dest_path`` never holds a partially-written file, even if the copy fails or another task is writing the same
+	blob at the same time.
+	"""
+	try:
+		os.link(src_path, dest_path)
+		return
+	except OSError as e:
+		if e.errno != errno.EXDEV:
+			raise
+	dest_dir, dest_name = os.path.split(dest_path)
+	fd, temp_path = tempfile.mkstemp(prefix=f".{dest_name}.", suffix=".tmp", dir=dest_dir)
+	try:
+		with open(src_path, "rb") as src, os.fdopen(fd, "wb") as dest:
+			try:
+				fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+			except OSError:
+				shutil.copyfileobj(src, dest)
+		os.replace(temp_path, dest_path)
+	except BaseException:
+		try:
+			os.unlink(temp_path)
+		except FileNotFoundError:
+			pass
+		raise
+
+
 def extract_data_by_keyspec(index_field, data):
 	"""
 	This method accepts a string like "foo.bar", and will traverse dict hierarchy ``metadata``
@@ -256,11 +298,14 @@ class FileStorageBackend(StorageBackend):
 				model.log.error("!!! Invalid JSON in FileStorageBackend (will be ignored so it can be repaired)", exc_info=je)
 				raise NotFoundError()
 
+	def get_disk_path(self, sha) -> str:
+		"""
+		Return the on-disk path of the entry for hash key ``sha``.
+		"""
+		return f"{self.root}/{sha[0:2]}/{sha[2:4]}/{sha[4:6]}/{sha}"
+
 	def write(self, data, blob_path=None) -> Optional[StoreObject]:
-		sha = self.store.key_spec.data_as_hash(data)
-		dir_index = f"{sha[0:2]}/{sha[2:4]}/{sha[4:6]}"
-		out_path = f"{self.root}/{dir_index}/{sha}"
-		os.makedirs(os.path.dirname(out_path), exist_ok=True)
+		out_path = self.get_disk_path(self.store.key_spec.data_as_hash(data))
 		return self._write_phase2(out_path, data, blob_path)
 
 	def _write_phase2(self, out_path, data, blob_path=None) -> Optional[StoreObject]:
@@ -282,7 +327,7 @@ class FileStorageBackend(StorageBackend):
 			#
 			# The try/except clause below prevents this collision from causing problems.
 			try:
-				os.link(blob_path, blob_outpath)
+				link_or_clone(blob_path, blob_outpath)
 			except FileExistsError:
 				pass
 		else:
@@ -290,22 +335,16 @@ class FileStorageBackend(StorageBackend):
 		return StoreObject(data=data, blob_path=blob_outpath, json_path=out_path)
 
 	def read(self, spec_dict) -> Optional[StoreObject]:
-		sha = self.store.key_spec.specdict_as_hash(spec_dict)
-		dir_index = f"{sha[0:2]}/{sha[2:4]}/{sha[4:6]}"
-		in_path = f"{self.root}/{dir_index}/{sha}"
-		if not os.path.exists(in_path):
-			return None
+		in_path = self.get_disk_path(self.store.key_spec.specdict_as_hash(spec_dict))
 		blob_path = in_path + ".blob"
 		try:
 			data = self.decode_data(in_path)
-		except json.decoder.JSONDecodeError as je:
+		except (FileNotFoundError, json.decoder.JSONDecodeError):
 			return None
 		return StoreObject(data=data, blob_path=blob_path if os.path.exists(blob_path) else None, json_path=in_path)
 
 	def delete(self, spec_dict) -> None:
-		sha = self.store.key_spec.specdict_as_hash(spec_dict)
-		dir_index = f"{sha[0:2]}/{sha[2:4]}/{sha[4:6]}"
-		in_path = f"{self.root}/{dir_index}/{sha}"
+		in_path = self.get_disk_path(self.store.key_spec.specdict_as_hash(spec_dict))
 		if os.path.exists(in_path):
 			os.unlink(in_path)
 		blob_path = in_path + ".blob"
@@ -1,3 +1,4 @@
+import functools
 import glob
 import logging
 import os
@@ -6,6 +7,20 @@ import subprocess
 from metatools.cmd import capture_bg, run_bg, ShellError, run_shell
 
 
+@functools.lru_cache(maxsize=None)
+def git_commit_env():
+	"""
+	Environment used for ``git commit``, built once per process rather than copying ``os.environ`` for every commit.
+	Callers must treat the returned dict as read-only.
+	"""
+	myenv = os.environ.copy()
+	if os.geteuid() == 0:
+		# make sure HOME is set if we are root (maybe we entered to a minimal environment -- this will mess git up.)
+		# In particular, a new tmux window will have HOME set to /root but NOT exported. Which will mess git up. (It won't know where to find ~/.gitconfig.)
+		myenv["HOME"] = "/root"
+	return myenv
+
+
 def head_sha1(tree):
 	retval, out = subprocess.getstatusoutput("(cd %s && git rev-parse HEAD)" % tree)
 	if retval == 0:
@@ -160,12 +175,7 @@ class Tree:
 		cmd += "EOF\n"
 		cmd += ")\n"
 		print("running: %s" % cmd)
-		myenv = os.environ.copy()
-		if os.geteuid() == 0:
-			# make sure HOME is set if we are root (maybe we entered to a minimal environment -- this will mess git up.)
-			# In particular, a new tmux window will have HOME set to /root but NOT exported. Which will mess git up. (It won't know where to find ~/.gitconfig.)
-			myenv["HOME"] = "/root"
-		retval = await run_bg(cmd, env=myenv)
+		retval = await run_bg(cmd, env=git_commit_env())
 		if retval not in [0, 1]:  # can return 1
 			print("Commit failed.")
 			raise ShellError("Aborting due to failed command.")
@@ -298,7 +308,7 @@ class GitTree(Tree):
 			self.root = "%s/%s" % (base, self.name)
 
 		if os.path.isdir("%s/.git" % self.root) and self.reclone:
-			await self.run_shell("rm -rf %s" % self.root)
+			await self.run_shell(["rm", "-rf", self.root])
 
 		if not os.path.isdir("%s/.git" % self.root):
 			if os.path.exists(self.root):
@@ -3,6 +3,19 @@
 import io
 import yaml
 
+try:
+	# The libyaml-based loader is much faster than the pure-Python one, when PyYAML has been built with it:
+	from yaml import CSafeLoader as SafeLoader
+except ImportError:
+	from yaml import SafeLoader
+
+
+def safe_load(stream):
+	"""
+	Drop-in replacement for ``yaml.safe_load()`` that uses libyaml, when available.
+	"""
+	return yaml.load(stream, Loader=SafeLoader)
+
 
 class YAMLReader:
 
@@ -13,7 +26,7 @@ class YAMLReader:
 		pass
 
 	def __init__(self, stream):
-		self.yaml = yaml.safe_load(stream)
+		self.yaml = safe_load(stream)
 		self.start()
 
 	def get_elem(self, el_path):
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+jinja2 = pytest.importorskip("jinja2")
+ebuild = pytest.importorskip("funtoo.pkgtools.ebuild")
+
+PRECOMPILE_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bin", "precompile-templates")
+
+TEMPLATE_SOURCE = """# Copyright 2024 Funtoo
+EAPI=7
+DESCRIPTION="{{ description }}"
+SRC_URI="{{ src_uri }}"
+{%- for dep in deps %}
+DEPEND="${DEPEND} {{ dep }}"
+{%- endfor %}
+"""
+
+
+def test_precompiled_template_round_trip(tmp_path):
+	"""
+	A template precompiled by ``bin/precompile-templates`` must load via ``load_precompiled_template()`` and render
+	exactly like the same template parsed from source.
+	"""
+	template_file = tmp_path / "foo.tmpl"
+	template_file.write_text(TEMPLATE_SOURCE)
+	subprocess.run([sys.executable, PRECOMPILE_TEMPLATES, str(tmp_path)], check=True)
+	assert (tmp_path / "foo.tmpl.py").exists()
+
+	template = ebuild.load_precompiled_template(str(template_file))
+	assert template is not None
+
+	render_args = {"description": "A test package", "src_uri": "https://example.com/foo-1.0.tar.gz", "deps": ["dev-libs/bar", "sys-libs/baz"]}
+	assert template.render(**render_args) == jinja2.Template(TEMPLATE_SOURCE).render(**render_args)